@@ -1,13 +1,13 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from flask_cors import CORS
 import database
-import time
 from functools import wraps
 
 # Blueprints
 from routes.auth import auth_bp, login_or_localhost_required, is_localhost
 from routes.products import products_bp
 from routes.sales import sales_bp
+from routes.status import status_bp
 
 app = Flask(__name__)
 app.secret_key = "super_secret_key" # Required for session
@@ -17,6 +17,7 @@ CORS(app)
 app.register_blueprint(auth_bp)
 app.register_blueprint(products_bp)
 app.register_blueprint(sales_bp)
+app.register_blueprint(status_bp)
 
 # --- Frontend Routes (MPA) ---
 
@@ -80,66 +81,8 @@ def edit_cash_page():
     current_cash = session_info['initial_cash'] if session_info else 0
     return render_template('edit_cash.html', current_cash=current_cash)
 
-# --- Status Logic ---
-connected_clients = {} # {ip: {'last_seen': time, 'logged_in': bool}}
-
-@app.route('/api/heartbeat', methods=['POST'])
-def heartbeat():
-    data = request.json
-    is_logged_in = data.get('logged_in', False)
-    client_ip = request.remote_addr
-    
-    # Debug heartbeat source
-    # print(f"HEARTBEAT: IP={client_ip}, LoggedIn={is_logged_in}")
-    
-    connected_clients[client_ip] = {
-        'last_seen': time.time(),
-        'logged_in': is_logged_in
-    }
-    return jsonify({'success': True})
-
-@app.route('/api/server_status')
-def server_status():
-    # Clean up old clients (> 10s)
-    now = time.time()
-    to_remove = [ip for ip, data in connected_clients.items() if now - data['last_seen'] > 10]
-    for ip in to_remove:
-        del connected_clients[ip]
-        
-    # Filter out localhost (POS App)
-    external_clients = {ip: data for ip, data in connected_clients.items() if ip != '127.0.0.1'}
-    
-    count = len(external_clients)
-    logged_in_count = sum(1 for data in external_clients.values() if data['logged_in'])
-    
-    # Logic Refined:
-    # Gray: 0 connections
-    # Yellow: Connections exist, but 0 logged in (Lurkers)
-    # Green: Exactly 1 connection, and it is logged in (Clean Admin)
-    # Orange: 1 logged in, but extra connections exist (Suspicious)
-    # Purple: > 1 logged in (Multiple Admins - Danger)
-    
-    if count == 0:
-        status_color = 'gray'
-    elif logged_in_count == 0:
-        status_color = '#FFC107' # Amber/Yellow (Lurkers)
-    elif logged_in_count == 1:
-        if count == 1:
-            status_color = '#28a745' # Green (Clean)
-        else:
-            status_color = '#F59E0B' # Orange (Suspicious - Admin + Lurkers)
-    else:
-        status_color = '#6f42c1' # Purple (Multiple Admins)
-        
-    return jsonify({
-        'status': 'online',
-        'active_clients': count,
-        'logged_in_clients': logged_in_count,
-        'color': status_color,
-        'clients_detail': external_clients # Debug info
-    })
-
 if __name__ == '__main__':
     database.init_db()
     # Run without reloader to ensure process termination works correctly from POS app
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    # threaded: each open status stream (SSE) holds a worker thread
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False, threaded=True)
@@ -1,8 +1,10 @@
 """
 Script para construir paquetes de actualización en USB
-Uso: python build_update.py <letra_unidad_usb> [nueva_version]
+Uso: python build_update.py <letra_unidad_usb> [nueva_version] [--base VERSION|manifest.json] [--archive]
 Ejemplo: python build_update.py E: 1.0.1
          python build_update.py E:  (auto-incrementa versión)
+         python build_update.py E: --base 1.0.7  (solo archivos cambiados desde 1.0.7)
+         python build_update.py E: --archive  (un solo archivo pos_update.zip)
 """
 
 import os
@@ -10,10 +12,17 @@ import sys
 import shutil
 import subprocess
 import json
-import hashlib
+import fnmatch
+import argparse
 from pathlib import Path
 from datetime import datetime
 import version
+from update_manifest import (MANIFEST_FILE, file_entry, manifest_checksum, diff_manifests,
+                             load_manifest, save_manifest, is_runtime_data)
+from update_archive import ARCHIVE_NAME, write_archive
+
+# Manifiestos completos de cada versión construida (base para paquetes delta)
+MANIFESTS_DIR = 'update_manifests'
 
 def parse_version(v):
     """Parse version string to tuple"""
@@ -36,30 +45,31 @@ def validate_version_format(v):
     except:
         return False
 
-def calculate_directory_checksum(directory):
-    """Calcula checksum SHA256 de todos los archivos en un directorio"""
-    sha256 = hashlib.sha256()
-    
-    for root, dirs, files in os.walk(directory):
-        # Ordenar para consistencia
-        for filename in sorted(files):
-            filepath = os.path.join(root, filename)
-            try:
-                with open(filepath, 'rb') as f:
-                    while chunk := f.read(8192):
-                        sha256.update(chunk)
-            except Exception as e:
-                print(f"Advertencia: No se pudo leer {filepath}: {e}")
-    
-    return sha256.hexdigest()
+def load_base_manifest(script_dir, base):
+    """
+    Carga el manifiesto de la versión base
+    
+    Args:
+        base: Versión (busca update_manifests/<version>.json) o ruta a un manifest.json
+    """
+    path = Path(base)
+    if not path.is_file():
+        path = script_dir / MANIFESTS_DIR / f"{base}.json"
+    if not path.is_file():
+        print(f"❌ Error: No se encontró manifiesto base para '{base}' ({path})")
+        sys.exit(1)
+    return load_manifest(path)
 
-def build_update_package(usb_drive, new_version=None):
+def build_update_package(usb_drive, new_version=None, base=None, archive=False):
     """
     Construye un paquete de actualización en la USB
     
     Args:
         usb_drive: Letra de unidad USB (ej: 'E:')
         new_version: Nueva versión o None para auto-incrementar
+        base: Versión instalada en producción (o su manifest.json) para generar
+              un paquete delta con solo los archivos modificados; None = completo
+        archive: Generar pos_update.zip (un solo archivo) en lugar de la carpeta pos_update
     """
     # 1. Determinar versión
     current_version = version.VERSION
@@ -95,7 +105,12 @@ def build_update_package(usb_drive, new_version=None):
     
     # 3. Preparar directorios
     script_dir = Path(__file__).parent
-    update_dir = Path(usb_drive) / 'pos_update'
+    if archive:
+        # Se arma en disco local y a la USB solo se escribe el zip
+        update_dir = script_dir / 'update_temp' / 'pos_update'
+        archive_path = Path(usb_drive) / ARCHIVE_NAME
+    else:
+        update_dir = Path(usb_drive) / 'pos_update'
     files_dir = update_dir / 'files'
     deps_dir = update_dir / 'dependencies'
     
@@ -106,6 +121,11 @@ def build_update_package(usb_drive, new_version=None):
         print(f"   Limpiando carpeta existente...")
         shutil.rmtree(update_dir)
     
+    # Un pos_update.zip viejo tendría prioridad sobre la carpeta nueva
+    stale_archive = Path(usb_drive) / ARCHIVE_NAME
+    if not archive and stale_archive.exists():
+        stale_archive.unlink()
+    
     # Crear directorios
     update_dir.mkdir(parents=True)
     files_dir.mkdir()
@@ -115,9 +135,10 @@ def build_update_package(usb_drive, new_version=None):
     print(f"\n📄 Copiando archivos del proyecto...")
     
     exclude_patterns = {
-        '.git', '.venv', '__pycache__', '*.pyc', '*.pyo', '*.db', '*.db-journal',
+        '.git', '.venv', '__pycache__', '*.pyc', '*.pyo', '*.db', '*.db-journal', '*.db-wal', '*.db-shm',
         'backups', 'update_temp', 'temp_barcode_*.png', 'test_*.png', 'test_*.py',
-        '.gemini', '.gitignore', 'build_update.py'
+        '.gemini', '.gitignore', 'build_update.py', MANIFESTS_DIR, MANIFEST_FILE,
+        'versions', 'active_version.json'
     }
     
     def should_exclude(path):
@@ -131,44 +152,85 @@ def build_update_package(usb_drive, new_version=None):
                 return True
         return False
     
+    def is_ignored(name):
+        """Mismas reglas que shutil.ignore_patterns para subdirectorios"""
+        return any(fnmatch.fnmatch(name, pattern) for pattern in exclude_patterns)
+    
+    def iter_project_files():
+        """Rutas relativas (con '/') de todos los archivos a empaquetar"""
+        for item in sorted(script_dir.iterdir()):
+            if should_exclude(item):
+                continue
+            if item.is_file():
+                yield item.name
+                continue
+            for root, dirs, files in os.walk(item):
+                rel_root = Path(root).relative_to(script_dir).as_posix()
+                dirs[:] = sorted(d for d in dirs
+                                 if not is_ignored(d) and not is_runtime_data(f"{rel_root}/{d}"))
+                for filename in sorted(files):
+                    if not is_ignored(filename):
+                        yield Path(root, filename).relative_to(script_dir).as_posix()
+    
+    def versioned_content(path):
+        """Contenido de version.py con la nueva versión"""
+        new_content = []
+        for line in path.read_text(encoding='utf-8').split('\n'):
+            if line.strip().startswith('VERSION ='):
+                new_content.append(f'VERSION = "{new_version}"')
+            else:
+                new_content.append(line)
+        return '\n'.join(new_content)
+    
+    # 5. Manifiesto completo (ruta, tamaño, SHA-256) de la nueva versión
+    print(f"\n🔢 Calculando manifiesto (versión {new_version})...")
+    staging_version = update_dir / 'version.py.tmp'
+    manifest_files = {}
+    for rel in iter_project_files():
+        source = script_dir / rel
+        if rel == 'version.py':
+            staging_version.write_text(versioned_content(source), encoding='utf-8')
+            source = staging_version
+        manifest_files[rel] = file_entry(source)
+    
+    base_manifest = load_base_manifest(script_dir, base) if base else None
+    if base_manifest:
+        changed, removed = diff_manifests(base_manifest['files'], manifest_files)
+        # Manifiestos anteriores pueden incluir datos de la instalación: no eliminarlos
+        removed = [rel for rel in removed if not is_runtime_data(rel)]
+        print(f"   Delta contra {base_manifest['version']}: {len(changed)} modificados, {len(removed)} eliminados")
+    else:
+        changed, removed = sorted(manifest_files), []
+    
     copied_count = 0
-    for item in script_dir.iterdir():
-        if should_exclude(item):
-            continue
-        
-        dest = files_dir / item.name
-        
+    for rel in changed:
+        source = staging_version if rel == 'version.py' else script_dir / rel
+        dest = files_dir / rel
         try:
-            if item.is_dir():
-                shutil.copytree(item, dest, ignore=shutil.ignore_patterns(*exclude_patterns))
-                copied_count += sum(1 for _ in dest.rglob('*') if _.is_file())
-            else:
-                shutil.copy2(item, dest)
-                copied_count += 1
-            print(f"   ✓ {item.name}")
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, dest)
+            copied_count += 1
         except Exception as e:
-            print(f"   ✗ Error copiando {item.name}: {e}")
+            print(f"   ✗ Error copiando {rel}: {e}")
+    if staging_version.exists():
+        staging_version.unlink()
     
     print(f"   Total: {copied_count} archivos copiados")
     
-    # 5. Actualizar version.py en el paquete
-    print(f"\n🔢 Actualizando version.py a {new_version}")
-    version_file = files_dir / 'version.py'
+    manifest = {
+        'version': new_version,
+        'base_version': base_manifest['version'] if base_manifest else None,
+        'files': manifest_files,
+        'delta': changed,
+        'removed': removed
+    }
+    save_manifest(update_dir / MANIFEST_FILE, manifest)
     
-    if version_file.exists():
-        # Leer contenido actual
-        content = version_file.read_text(encoding='utf-8')
-        # Reemplazar la línea VERSION
-        new_content = []
-        for line in content.split('\n'):
-            if line.strip().startswith('VERSION ='):
-                new_content.append(f'VERSION = "{new_version}"')
-            else:
-                new_content.append(line)
-        version_file.write_text('\n'.join(new_content), encoding='utf-8')
-        print(f"   ✓ version.py actualizado")
-    else:
-        print(f"   ⚠ Advertencia: No se encontró version.py en archivos copiados")
+    # Guardar el manifiesto completo como base para futuros paquetes delta
+    manifests_dir = script_dir / MANIFESTS_DIR
+    manifests_dir.mkdir(exist_ok=True)
+    save_manifest(manifests_dir / f"{new_version}.json", manifest)
+    print(f"   ✓ {MANIFEST_FILE} creado ({len(manifest_files)} archivos)")
     
     # 6. Descargar dependencias (wheels)
     print(f"\n📦 Descargando dependencias...")
@@ -208,8 +270,14 @@ def build_update_package(usb_drive, new_version=None):
     # 7. Generar update_info.json
     print(f"\n📋 Generando update_info.json...")
     
-    # Calcular checksum de archivos
-    files_checksum = calculate_directory_checksum(files_dir)
+    # Checksum del contenido completo de la versión (a partir del manifiesto)
+    files_checksum = manifest_checksum(manifest_files)
+    
+    # SHA-256 de cada wheel: el instalador los verifica antes de llamar a pip
+    dependency_files = {
+        wheel.name: file_entry(wheel)['sha256']
+        for wheel in sorted(deps_dir.iterdir()) if wheel.suffix in ('.whl', '.gz', '.zip')
+    }
     
     # Leer dependencias de requirements.txt
     dependencies = {}
@@ -229,7 +297,10 @@ def build_update_package(usb_drive, new_version=None):
         'requires_python': f'>={sys.version_info.major}.{sys.version_info.minor}',
         'platform': 'win_amd64',
         'files_checksum': files_checksum,
-        'dependencies': dependencies
+        'manifest': MANIFEST_FILE,
+        'base_version': manifest['base_version'],
+        'dependencies': dependencies,
+        'dependency_files': dependency_files
     }
     
     info_file = update_dir / 'update_info.json'
@@ -238,6 +309,15 @@ def build_update_package(usb_drive, new_version=None):
     
     print(f"   ✓ update_info.json creado")
     
+    if archive:
+        print(f"\n🗜  Comprimiendo en {archive_path}...")
+        # Una carpeta pos_update vieja en la USB tendría prioridad en equipos antiguos
+        if (Path(usb_drive) / 'pos_update').exists():
+            shutil.rmtree(Path(usb_drive) / 'pos_update')
+        members = write_archive(update_dir, archive_path)
+        shutil.rmtree(update_dir.parent)
+        print(f"   ✓ {ARCHIVE_NAME} creado ({members} archivos, {archive_path.stat().st_size / 1024 / 1024:.1f} MB)")
+    
     # 8. Actualizar version.py local (opcional)
     print(f"\n🔄 ¿Actualizar version.py local a {new_version}? (s/n): ", end='')
     response = input().strip().lower()
@@ -259,9 +339,9 @@ def build_update_package(usb_drive, new_version=None):
     print(f"\n" + "="*60)
     print(f"✅ PAQUETE DE ACTUALIZACIÓN CREADO EXITOSAMENTE")
     print(f"="*60)
-    print(f"📍 Ubicación: {update_dir}")
+    print(f"📍 Ubicación: {archive_path if archive else update_dir}")
     print(f"📦 Versión: {new_version}")
-    print(f"📄 Archivos: {copied_count}")
+    print(f"📄 Archivos: {copied_count}" + (f" (delta desde {manifest['base_version']})" if base_manifest else ""))
     print(f"🔧 Dependencias: {len(dependencies)}")
     print(f"🔒 Checksum: {files_checksum[:16]}...")
     print(f"\n💡 Para usar: Conecta la USB en la máquina de producción")
@@ -269,19 +349,17 @@ def build_update_package(usb_drive, new_version=None):
     print(f"="*60 + "\n")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso: python build_update.py <letra_unidad_usb> [nueva_version]")
-        print("\nEjemplos:")
-        print("  python build_update.py E: 1.0.1    # Versión específica")
-        print("  python build_update.py E:          # Auto-incrementa versión patch")
-        sys.exit(1)
-    
-    usb_drive = sys.argv[1]
-    new_version = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(description="Construye un paquete de actualización en USB")
+    parser.add_argument("usb_drive", help="Letra de unidad USB (ej: E:)")
+    parser.add_argument("new_version", nargs="?", help="Nueva versión X.Y.Z (default: auto-incrementa patch)")
+    parser.add_argument("--base", help="Versión instalada (o ruta a su manifest.json) para generar un paquete delta")
+    parser.add_argument("--archive", action="store_true",
+                        help=f"Generar un solo archivo {ARCHIVE_NAME} (más rápido en USB lentas)")
+    args = parser.parse_args()
     
     print("\n🚀 CONSTRUCTOR DE PAQUETES DE ACTUALIZACIÓN")
     print("="*60)
     print(f"Versión actual: {version.VERSION}")
     print("="*60 + "\n")
     
-    build_update_package(usb_drive, new_version)
+    build_update_package(args.usb_drive, args.new_version, args.base, args.archive)
@@ -2,7 +2,7 @@ $ErrorActionPreference = "Stop"
 
 $WorkDir = "c:\Users\jesja\PycharmProjects\punto_venta"
 $PythonExe = "$WorkDir\.venv\Scripts\pythonw.exe"
-$ScriptPath = "$WorkDir\pos_app.py"
+$ScriptPath = "$WorkDir\launcher.py"
 $ShortcutPath = "$Home\Desktop\Punto de Venta.lnk"
 
 $WshShell = New-Object -comObject WScript.Shell
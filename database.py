@@ -1,15 +1,73 @@
 import sqlite3
 import datetime
+import queue
+from contextlib import contextmanager
 
 DB_NAME = "pos_system.db"
 
+# Connection tuning
+BUSY_TIMEOUT = 5.0  # Seconds to wait on a locked database (POS app + backend share the file)
+POOL_SIZE = 4
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # Readers don't block the writer (and vice versa)
+    "PRAGMA synchronous=NORMAL",    # Safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size=-8000",      # ~8 MB page cache
+    "PRAGMA mmap_size=67108864",    # 64 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+def _open_connection():
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, check_same_thread=False)
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """
+    Opens a standalone, tuned connection. The caller owns it and must close it.
+    Module functions use connection() instead, which reuses pooled connections.
+    """
+    return _open_connection()
 
-def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+@contextmanager
+def connection():
+    """
+    Borrows a connection from the pool for the current thread.
+    Any transaction left open (error or missing commit) is rolled back before
+    the connection goes back to the pool.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _open_connection()
+
+    try:
+        yield conn
+    finally:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            _pool.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+def close_all_connections():
+    """Closes every idle pooled connection (e.g. before replacing the DB file)."""
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+
+# --- Schema Migrations ---
+# Each migration runs exactly once, in order. PRAGMA user_version holds the number
+# of applied migrations, so a warm start costs one PRAGMA read and no DDL.
+
+def _migration_base_schema(cursor):
     # Products Table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS products (
@@ -21,11 +79,10 @@ def init_db():
         )
     ''')
     
-    # Migration for existing table
-    try:
+    # Databases created before image support lack this column
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(products)")]
+    if 'image_path' not in columns:
         cursor.execute("ALTER TABLE products ADD COLUMN image_path TEXT")
-    except sqlite3.OperationalError:
-        pass # Column likely exists
     
     # Sessions Table
     cursor.execute('''
@@ -63,30 +120,171 @@ def init_db():
             FOREIGN KEY(product_id) REFERENCES products(id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+def _migration_sales_aggregates(cursor):
+    # Maintained by record_sale
+    # scope: 'all' (key ''), 'day' (key YYYY-MM-DD), 'session' (key session id)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_aggregates (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY(scope, key)
+        )
+    ''')
+    _rebuild_sales_aggregates(cursor)
+
+def _migration_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_session_id ON sales(session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_timestamp ON sales(timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON sale_items(sale_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status)")
+    cursor.execute("ANALYZE")
+
+def _migration_catalog_version(cursor):
+    # Bumped by triggers on every product change (from any process), so the POS
+    # app can keep an in-memory catalog and reload it only when this changes.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_products_{event.lower()}_version
+            AFTER {event} ON products
+            BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+def _migration_print_jobs(cursor):
+    # Durable spool for PrintQueue: receipts are stored as raw ESC/POS bytes and
+    # deleted once printed, so anything left here survives a crash or power loss.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS print_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            sale_id INTEGER,
+            payload BLOB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs(status, id)")
+
+def _migration_product_updated_at(cursor):
+    # Lets label printing select products added/changed since a date (--since)
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(products)")]
+    if 'updated_at' not in columns:
+        cursor.execute("ALTER TABLE products ADD COLUMN updated_at TEXT")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_insert_touch
+        AFTER INSERT ON products
+        BEGIN
+            UPDATE products SET updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime') WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_products_update_touch
+        AFTER UPDATE OF barcode, name, price ON products
+        BEGIN
+            UPDATE products SET updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime') WHERE id = NEW.id;
+        END
+    ''')
+
+def _migration_product_touch_guard(cursor):
+    # Only real changes touch updated_at (re-importing an unchanged catalog must
+    # not mark every product), and rows from before product_updated_at get a date
+    cursor.execute("DROP TRIGGER IF EXISTS trg_products_update_touch")
+    cursor.execute('''
+        CREATE TRIGGER trg_products_update_touch
+        AFTER UPDATE OF barcode, name, price ON products
+        WHEN OLD.barcode IS NOT NEW.barcode OR OLD.name IS NOT NEW.name OR OLD.price IS NOT NEW.price
+        BEGIN
+            UPDATE products SET updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime') WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        UPDATE products SET updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+        WHERE updated_at IS NULL
+    ''')
+
+# Append only: never reorder or remove entries
+MIGRATIONS = [
+    ('base_schema', _migration_base_schema),
+    ('sales_aggregates', _migration_sales_aggregates),
+    ('indexes', _migration_indexes),
+    ('catalog_version', _migration_catalog_version),
+    ('print_jobs', _migration_print_jobs),
+    ('product_updated_at', _migration_product_updated_at),
+    ('product_touch_guard', _migration_product_touch_guard),
+]
+
+def _get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def init_db():
+    with connection() as conn:
+        if _get_schema_version(conn) >= len(MIGRATIONS):
+            return
+
+        # Serialize with other processes (POS app and backend both call init_db)
+        conn.execute("BEGIN IMMEDIATE")
+        version = _get_schema_version(conn)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+
+        for number, (name, migrate) in enumerate(MIGRATIONS[version:], start=version + 1):
+            print(f"Database: applying migration {number} ({name})")
+            migrate(cursor)
+            cursor.execute("INSERT OR REPLACE INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                           (number, name, datetime.datetime.now().isoformat()))
+            cursor.execute(f"PRAGMA user_version = {number}")
+
+        conn.commit()
     print("Database initialized.")
 
+def _rebuild_sales_aggregates(cursor):
+    cursor.execute("DELETE FROM sales_aggregates")
+    cursor.execute('''
+        INSERT INTO sales_aggregates (scope, key, sale_count, revenue)
+        SELECT 'all', '', COUNT(*), COALESCE(SUM(total), 0) FROM sales
+    ''')
+    cursor.execute('''
+        INSERT INTO sales_aggregates (scope, key, sale_count, revenue)
+        SELECT 'day', substr(timestamp, 1, 10), COUNT(*), SUM(total) FROM sales GROUP BY substr(timestamp, 1, 10)
+    ''')
+    cursor.execute('''
+        INSERT INTO sales_aggregates (scope, key, sale_count, revenue)
+        SELECT 'session', CAST(session_id AS TEXT), COUNT(*), SUM(total) FROM sales
+        WHERE session_id IS NOT NULL GROUP BY session_id
+    ''')
+
 # --- Product Operations ---
 def add_product(barcode, name, price, image_path=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO products (barcode, name, price, image_path) VALUES (?, ?, ?, ?)", (barcode, name, price, image_path))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
+    with connection() as conn:
+        try:
+            conn.execute("INSERT INTO products (barcode, name, price, image_path) VALUES (?, ?, ?, ?)", (barcode, name, price, image_path))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
 
 def get_product_by_barcode(barcode):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products WHERE barcode = ?", (barcode,))
-    product = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        product = conn.execute("SELECT * FROM products WHERE barcode = ?", (barcode,)).fetchone()
     if product:
         # Check if tuple has image_path (index 4)
         img = product[4] if len(product) > 4 else None
@@ -94,175 +292,359 @@ def get_product_by_barcode(barcode):
     return None
 
 def get_all_products():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products ORDER BY name")
-    rows = cursor.fetchall()
-    conn.close()
+    with connection() as conn:
+        rows = conn.execute("SELECT * FROM products ORDER BY name").fetchall()
     products = []
     for r in rows:
         img = r[4] if len(r) > 4 else None
         products.append({'id': r[0], 'barcode': r[1], 'name': r[2], 'price': r[3], 'image_path': img})
     return products
 
+def get_products_for_labels(since=None, ids=None):
+    """
+    Products in id order for label printing.
+    since: ISO date/datetime; only products added or changed from then on.
+    ids: iterable of product ids.
+    """
+    clauses, params = [], []
+    if since:
+        clauses.append("updated_at >= ?")
+        params.append(since)
+    if ids:
+        ids = list(ids)
+        clauses.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    with connection() as conn:
+        rows = conn.execute(f"SELECT id, barcode, name, price FROM products{where} ORDER BY id", params).fetchall()
+    return [{'id': r[0], 'barcode': r[1], 'name': r[2], 'price': r[3]} for r in rows]
+
+def get_catalog_version():
+    with connection() as conn:
+        row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
 def update_product(id, barcode, name, price, image_path=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        if image_path:
-            cursor.execute("UPDATE products SET barcode = ?, name = ?, price = ?, image_path = ? WHERE id = ?", (barcode, name, price, image_path, id))
-        else:
-            cursor.execute("UPDATE products SET barcode = ?, name = ?, price = ? WHERE id = ?", (barcode, name, price, id))
+    with connection() as conn:
+        try:
+            if image_path:
+                conn.execute("UPDATE products SET barcode = ?, name = ?, price = ?, image_path = ? WHERE id = ?", (barcode, name, price, image_path, id))
+            else:
+                conn.execute("UPDATE products SET barcode = ?, name = ?, price = ? WHERE id = ?", (barcode, name, price, id))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+UPSERT_CHUNK_SIZE = 500
+
+def upsert_products(products, progress_callback=None):
+    """
+    Inserts or updates products by barcode in a single transaction.
+    products: iterable of (barcode, name, price, image_path); a None image_path
+    keeps the existing image. progress_callback(done, total) is called per chunk.
+    Returns (inserted_count, updated_count) over distinct barcodes; unchanged
+    products are not counted. Nothing is written if any row fails.
+    """
+    products = list(products)
+    total = len(products)
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        existing = {r[0]: (r[1], r[2], r[3])
+                    for r in conn.execute("SELECT barcode, name, price, image_path FROM products")}
+        # Final state per barcode (same barcode twice counts as one product), so
+        # only products whose name, price or image really change count as updated
+        final = {}
+        for barcode, name, price, image_path in products:
+            current = final.get(barcode, existing.get(barcode))
+            keep_image = current[2] if current else None
+            final[barcode] = (name, price, keep_image if image_path is None else image_path)
+        inserted = sum(1 for barcode in final if barcode not in existing)
+        updated = sum(1 for barcode, row in final.items() if barcode in existing and row != existing[barcode])
+
+        for start in range(0, total, UPSERT_CHUNK_SIZE):
+            chunk = products[start:start + UPSERT_CHUNK_SIZE]
+            conn.executemany('''
+                INSERT INTO products (barcode, name, price, image_path) VALUES (?, ?, ?, ?)
+                ON CONFLICT(barcode) DO UPDATE SET
+                    name = excluded.name,
+                    price = excluded.price,
+                    image_path = COALESCE(excluded.image_path, products.image_path)
+                WHERE products.name IS NOT excluded.name
+                   OR products.price IS NOT excluded.price
+                   OR (excluded.image_path IS NOT NULL AND products.image_path IS NOT excluded.image_path)
+            ''', chunk)
+            if progress_callback:
+                progress_callback(start + len(chunk), total)
+
         conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
+    return inserted, updated
 
 def delete_product(id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM products WHERE id = ?", (id,))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("DELETE FROM products WHERE id = ?", (id,))
+        conn.commit()
 
 def clear_products():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM products")
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("DELETE FROM products")
+        conn.commit()
 
 # --- Session Operations ---
 def create_session(initial_cash):
-    conn = get_connection()
-    cursor = conn.cursor()
     start_time = datetime.datetime.now().isoformat()
-    cursor.execute("INSERT INTO sessions (start_time, initial_cash, status) VALUES (?, ?, 'OPEN')", (start_time, initial_cash))
-    session_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        cursor = conn.execute("INSERT INTO sessions (start_time, initial_cash, status) VALUES (?, ?, 'OPEN')", (start_time, initial_cash))
+        session_id = cursor.lastrowid
+        conn.commit()
     return session_id
 
 def get_active_session():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM sessions WHERE status = 'OPEN' ORDER BY id DESC LIMIT 1")
-    session = cursor.fetchone()
-    conn.close()
+    with connection() as conn:
+        session = conn.execute("SELECT * FROM sessions WHERE status = 'OPEN' ORDER BY id DESC LIMIT 1").fetchone()
     if session:
         return {'id': session[0], 'start_time': session[1], 'initial_cash': session[3]}
     return None
 
 def close_session(session_id, final_cash):
-    conn = get_connection()
-    cursor = conn.cursor()
     end_time = datetime.datetime.now().isoformat()
-    cursor.execute("UPDATE sessions SET end_time = ?, final_cash = ?, status = 'CLOSED' WHERE id = ?", (end_time, final_cash, session_id))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("UPDATE sessions SET end_time = ?, final_cash = ?, status = 'CLOSED' WHERE id = ?", (end_time, final_cash, session_id))
+        conn.commit()
 
 def update_session_initial_cash(session_id, new_amount):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE sessions SET initial_cash = ? WHERE id = ?", (new_amount, session_id))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute("UPDATE sessions SET initial_cash = ? WHERE id = ?", (new_amount, session_id))
+        conn.commit()
 
 def get_session_sales_total(session_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT SUM(total) FROM sales WHERE session_id = ?", (session_id,))
-    total = cursor.fetchone()[0]
-    conn.close()
-    return total if total else 0.0
+    return get_sales_aggregate('session', session_id)['revenue']
+
+def get_sales_aggregate(scope, key=''):
+    """
+    Returns {'sale_count', 'revenue'} for scope 'all', 'day' (key: YYYY-MM-DD)
+    or 'session' (key: session id). O(1): reads the row kept by record_sale.
+    """
+    with connection() as conn:
+        row = conn.execute("SELECT sale_count, revenue FROM sales_aggregates WHERE scope = ? AND key = ?",
+                           (scope, str(key))).fetchone()
+    if row:
+        return {'sale_count': row[0], 'revenue': row[1]}
+    return {'sale_count': 0, 'revenue': 0.0}
+
+def _row_to_item(r):
+    return {
+        'name': r[0],
+        'quantity': r[1],
+        'price': r[2],
+        'image_path': r[3],
+        'barcode': r[4]
+    }
+
+def _format_timestamp(ts):
+    try:
+        dt = datetime.datetime.fromisoformat(ts)
+        return dt.strftime("%Y-%m-%d %H:%M")
+    except:
+        return ts
 
 def get_items_for_sale(sale_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT p.name, si.quantity, si.price_at_sale, p.image_path, p.barcode
-        FROM sale_items si
-        JOIN products p ON si.product_id = p.id
-        WHERE si.sale_id = ?
-    ''', (sale_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        items.append({
-            'name': r[0],
-            'quantity': r[1],
-            'price': r[2],
-            'image_path': r[3],
-            'barcode': r[4]
-        })
-    return items
+    with connection() as conn:
+        rows = conn.execute('''
+            SELECT p.name, si.quantity, si.price_at_sale, p.image_path, p.barcode
+            FROM sale_items si
+            JOIN products p ON si.product_id = p.id
+            WHERE si.sale_id = ?
+        ''', (sale_id,)).fetchall()
+    return [_row_to_item(r) for r in rows]
+
+def _fetch_sales(conn, where="", params=(), limit=None, include_items=True):
+    """
+    Loads sales matching `where` plus all of their items in two queries.
+    Items are fetched with the same filter as a subquery and grouped in Python,
+    so the number of round-trips doesn't grow with the number of sales.
+    """
+    order = " ORDER BY id DESC"
+    if limit is not None:
+        order += " LIMIT ?"
+        params = tuple(params) + (limit,)
+
+    rows = conn.execute(f"SELECT id, timestamp, total, payment_method FROM sales {where}{order}", params).fetchall()
+    if not rows:
+        return []
+
+    items_by_sale = {}
+    if include_items:
+        item_rows = conn.execute(f'''
+            SELECT si.sale_id, p.name, si.quantity, si.price_at_sale, p.image_path, p.barcode
+            FROM sale_items si
+            JOIN products p ON si.product_id = p.id
+            WHERE si.sale_id IN (SELECT id FROM sales {where}{order})
+            ORDER BY si.id
+        ''', params)
+        for r in item_rows:
+            items_by_sale.setdefault(r[0], []).append(_row_to_item(r[1:]))
 
-def get_sales_by_session(session_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, timestamp, total, payment_method FROM sales WHERE session_id = ? ORDER BY id DESC", (session_id,))
-    rows = cursor.fetchall()
-    conn.close()
     sales = []
     for r in rows:
-        try:
-            dt = datetime.datetime.fromisoformat(r[1])
-            ts_str = dt.strftime("%Y-%m-%d %H:%M")
-        except:
-            ts_str = r[1]
-            
-        sales.append({
+        sale = {
             'id': r[0],
-            'timestamp': ts_str,
+            'timestamp': _format_timestamp(r[1]),
             'total': r[2],
-            'payment_method': r[3],
-            'items': get_items_for_sale(r[0])
-        })
+            'payment_method': r[3]
+        }
+        if include_items:
+            sale['items'] = items_by_sale.get(r[0], [])
+        sales.append(sale)
     return sales
 
-def get_all_sales():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, timestamp, total, payment_method FROM sales ORDER BY id DESC") 
-    rows = cursor.fetchall()
-    conn.close()
-    sales = []
-    for r in rows:
-        try:
-            dt = datetime.datetime.fromisoformat(r[1])
-            ts_str = dt.strftime("%Y-%m-%d %H:%M")
-        except:
-            ts_str = r[1]
-            
-        sales.append({
-            'id': r[0],
-            'timestamp': ts_str,
-            'total': r[2],
-            'payment_method': r[3],
-            'items': get_items_for_sale(r[0])
-        })
+def _attach_daily_numbers(conn, sales, session_id=None):
+    """
+    Sets 'daily_number' (1 = first sale of that day) on a page of sales sorted by id DESC.
+    Uses a single grouped COUNT over the days covered by the page; with session_id
+    only that session's sales are counted, matching a page filtered by session.
+    """
+    days = sorted({s['timestamp'][:10] for s in sales})
+    try:
+        last_day = datetime.date.fromisoformat(days[-1])
+        datetime.date.fromisoformat(days[0])
+    except ValueError:
+        return
+
+    conditions = "timestamp >= ? AND timestamp < ? AND id <= ?"
+    params = [days[0], (last_day + datetime.timedelta(days=1)).isoformat(), sales[0]['id']]
+    if session_id is not None:
+        conditions += " AND session_id = ?"
+        params.append(session_id)
+    rows = conn.execute(f'''
+        SELECT substr(timestamp, 1, 10), COUNT(*)
+        FROM sales
+        WHERE {conditions}
+        GROUP BY 1
+    ''', params).fetchall()
+    remaining = dict(rows)
+
+    for s in sales:
+        day = s['timestamp'][:10]
+        s['daily_number'] = remaining.get(day, 0)
+        remaining[day] = s['daily_number'] - 1
+
+def get_sales_page(limit=50, before_id=None, after_id=None, session_id=None,
+                   date_from=None, date_to=None, include_items=True):
+    """
+    Keyset-paginated sales, newest first.
+    before_id/after_id: only sales older/newer than that id.
+    date_from/date_to: inclusive 'YYYY-MM-DD' bounds on the sale timestamp.
+    """
+    conditions = []
+    params = []
+    if before_id is not None:
+        conditions.append("id < ?")
+        params.append(before_id)
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    if session_id is not None:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    if date_from is not None:
+        conditions.append("timestamp >= ?")
+        params.append(date_from.isoformat())
+    if date_to is not None:
+        conditions.append("timestamp < ?")
+        params.append((date_to + datetime.timedelta(days=1)).isoformat())
+
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    with connection() as conn:
+        sales = _fetch_sales(conn, where, params, limit=limit, include_items=include_items)
+        if sales:
+            _attach_daily_numbers(conn, sales, session_id)
     return sales
 
+def get_sales_by_session(session_id):
+    with connection() as conn:
+        return _fetch_sales(conn, "WHERE session_id = ?", (session_id,))
+
+def get_all_sales():
+    with connection() as conn:
+        return _fetch_sales(conn)
+
 # --- Sales Operations ---
 def record_sale(session_id, items, total, payment_method):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     timestamp = datetime.datetime.now().isoformat()
-    cursor.execute("INSERT INTO sales (session_id, timestamp, total, payment_method) VALUES (?, ?, ?, ?)", 
-                   (session_id, timestamp, total, payment_method))
-    sale_id = cursor.lastrowid
-    
-    for item in items:
-        cursor.execute("INSERT INTO sale_items (sale_id, product_id, quantity, price_at_sale) VALUES (?, ?, ?, ?)",
-                       (sale_id, item['id'], item['quantity'], item['price']))
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO sales (session_id, timestamp, total, payment_method) VALUES (?, ?, ?, ?)", 
+                       (session_id, timestamp, total, payment_method))
+        sale_id = cursor.lastrowid
+        
+        cursor.executemany("INSERT INTO sale_items (sale_id, product_id, quantity, price_at_sale) VALUES (?, ?, ?, ?)",
+                           [(sale_id, item['id'], item['quantity'], item['price']) for item in items])
         
-    conn.commit()
-    conn.close()
+        # Keep aggregates in the same transaction as the sale
+        scopes = [('all', ''), ('day', timestamp[:10])]
+        if session_id is not None:
+            scopes.append(('session', str(session_id)))
+        cursor.executemany('''
+            INSERT INTO sales_aggregates (scope, key, sale_count, revenue) VALUES (?, ?, 1, ?)
+            ON CONFLICT(scope, key) DO UPDATE SET
+                sale_count = sale_count + 1,
+                revenue = revenue + excluded.revenue
+        ''', [(scope, key, total) for scope, key in scopes])
+            
+        conn.commit()
     return sale_id
 
+# --- Print Spool ---
+def enqueue_print_job(payload, sale_id=None):
+    with connection() as conn:
+        cursor = conn.execute("INSERT INTO print_jobs (created_at, sale_id, payload) VALUES (?, ?, ?)",
+                              (datetime.datetime.now().isoformat(), sale_id, payload))
+        conn.commit()
+        return cursor.lastrowid
+
+def get_pending_print_jobs():
+    with connection() as conn:
+        rows = conn.execute('''
+            SELECT id, sale_id, payload, attempts, next_attempt_at FROM print_jobs
+            WHERE status = 'pending' ORDER BY id
+        ''').fetchall()
+    return [{'id': r[0], 'sale_id': r[1], 'payload': r[2], 'attempts': r[3], 'next_attempt_at': r[4]} for r in rows]
+
+def complete_print_job(job_id):
+    with connection() as conn:
+        conn.execute("DELETE FROM print_jobs WHERE id = ?", (job_id,))
+        conn.commit()
+
+def reschedule_print_job(job_id, attempts, next_attempt_at, error):
+    with connection() as conn:
+        conn.execute("UPDATE print_jobs SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                     (attempts, next_attempt_at, error, job_id))
+        conn.commit()
+
+def fail_print_job(job_id, attempts, error):
+    with connection() as conn:
+        conn.execute("UPDATE print_jobs SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                     (attempts, error, job_id))
+        conn.commit()
+
+def prune_failed_print_jobs(older_than_days):
+    """Deletes failed jobs (and their payloads) created more than older_than_days ago."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).isoformat()
+    with connection() as conn:
+        cursor = conn.execute("DELETE FROM print_jobs WHERE status = 'failed' AND created_at < ?", (cutoff,))
+        conn.commit()
+        return cursor.rowcount
+
+def requeue_failed_print_jobs():
+    with connection() as conn:
+        cursor = conn.execute('''
+            UPDATE print_jobs SET status = 'pending', attempts = 0, next_attempt_at = 0
+            WHERE status = 'failed'
+        ''')
+        conn.commit()
+        return cursor.rowcount
+
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,57 @@
+"""
+Lanzador de la aplicación
+Ejecuta pos_app.py de la versión activa (versions/<versión>, indicada en
+active_version.json) o el de la raíz si aún no hay instalaciones escalonadas.
+El directorio de trabajo siempre es la raíz: base de datos, settings.json e
+imágenes subidas se comparten entre versiones.
+"""
+
+import os
+import sys
+import json
+import subprocess
+from typing import Optional
+
+VERSIONS_DIR = 'versions'
+ACTIVE_VERSION_FILE = 'active_version.json'
+MAIN_SCRIPT = 'pos_app.py'
+
+def find_app_root(path: str = __file__) -> str:
+    """Raíz de la instalación, tanto para la copia de la raíz como para versions/<v>/"""
+    script_dir = os.path.dirname(os.path.abspath(path))
+    parent = os.path.dirname(script_dir)
+    if os.path.basename(parent) == VERSIONS_DIR:
+        return os.path.dirname(parent)
+    return script_dir
+
+def read_active_version(app_root: str) -> Optional[dict]:
+    """Contenido de active_version.json ({'version', 'previous', ...}) o None"""
+    try:
+        with open(os.path.join(app_root, ACTIVE_VERSION_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def active_code_dir(app_root: str) -> str:
+    """Directorio con el código de la versión activa"""
+    active = read_active_version(app_root)
+    if active:
+        version_dir = os.path.join(app_root, VERSIONS_DIR, active['version'])
+        if os.path.isfile(os.path.join(version_dir, MAIN_SCRIPT)):
+            return version_dir
+    return app_root
+
+def is_inactive_copy(path: str) -> bool:
+    """True si path (un pos_app.py) no pertenece a la versión activa"""
+    app_root = find_app_root(path)
+    active_script = os.path.join(active_code_dir(app_root), MAIN_SCRIPT)
+    return os.path.normcase(os.path.abspath(path)) != os.path.normcase(os.path.abspath(active_script))
+
+def run(args=None, script: str = MAIN_SCRIPT) -> int:
+    """Ejecuta script de la versión activa y devuelve su código de salida"""
+    app_root = find_app_root()
+    entry = os.path.join(active_code_dir(app_root), script)
+    return subprocess.call([sys.executable, entry] + list(args or []), cwd=app_root)
+
+if __name__ == "__main__":
+    sys.exit(run(sys.argv[1:]))
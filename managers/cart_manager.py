@@ -1,54 +1,91 @@
 from tkinter import messagebox
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
 from typing import List, Dict, Any, Optional
 from ui.styles import COLOR_SUCCESS, COLOR_WARNING, COLOR_DANGER
 from ui.checkout_dialog import CheckoutDialog
+from print_queue import MAX_ATTEMPTS
 import database
 
+def to_cents(amount: Any) -> int:
+    """Converts a price (float/str/Decimal) to integer cents, rounding half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
 class CartManager:
     def __init__(self, app: Any):
         self.app = app
-        self.cart: List[Dict[str, Any]] = []
+        # product id -> line item, in scan order. Totals are kept in integer cents
+        # and updated incrementally, so every operation is O(1) and exact.
+        self.items: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.total_cents: int = 0
+        self.total_items: int = 0
 
-    def add_to_cart(self, product: Dict[str, Any]) -> None:
-        for item in self.cart:
-            if item['id'] == product['id']:
-                item['quantity'] += 1
-                item['total'] = item['quantity'] * item['price']
-                self.update_ui()
-                self.app.left_panel.set_last_item(f"Agregado: {product['name']} (x{item['quantity']})", COLOR_SUCCESS)
-                return
-
-        self.cart.append({
+    # Public cart view (list of line items) used by the UI, printer and database
+    @property
+    def cart(self) -> List[Dict[str, Any]]:
+        return list(self.items.values())
+
+    @cart.setter
+    def cart(self, value: List[Dict[str, Any]]) -> None:
+        self.items = OrderedDict()
+        self.total_cents = 0
+        self.total_items = 0
+        for item in value:
+            line = self._new_line(item)
+            self._set_quantity(line, item.get('quantity', 1))
+            self.items[line['id']] = line
+
+    @property
+    def total_sum(self) -> float:
+        return self.total_cents / 100
+
+    def _new_line(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             'id': product['id'],
             'name': product['name'],
             'price': product['price'],
-            'quantity': 1,
-            'total': product['price']
-        })
+            'price_cents': to_cents(product['price']),
+            'quantity': 0,
+            'total': 0.0,
+            'total_cents': 0
+        }
+
+    def _set_quantity(self, line: Dict[str, Any], quantity: int) -> None:
+        new_total_cents = quantity * line['price_cents']
+        self.total_cents += new_total_cents - line['total_cents']
+        self.total_items += quantity - line['quantity']
+        line['quantity'] = quantity
+        line['total_cents'] = new_total_cents
+        line['total'] = new_total_cents / 100
+
+    def add_to_cart(self, product: Dict[str, Any]) -> None:
+        line = self.items.get(product['id'])
+        if line is None:
+            line = self.items[product['id']] = self._new_line(product)
+        self._set_quantity(line, line['quantity'] + 1)
         self.update_ui()
-        self.app.left_panel.set_last_item(f"Agregado: {product['name']}", COLOR_SUCCESS)
+
+        if line['quantity'] > 1:
+            self.app.left_panel.set_last_item(f"Agregado: {product['name']} (x{line['quantity']})", COLOR_SUCCESS)
+        else:
+            self.app.left_panel.set_last_item(f"Agregado: {product['name']}", COLOR_SUCCESS)
 
     def remove_from_cart(self, product: Dict[str, Any]) -> None:
-        found = False
-        for i, item in enumerate(self.cart):
-            if item['id'] == product['id']:
-                found = True
-                item['quantity'] -= 1
-                item['total'] = item['quantity'] * item['price']
-                
-                msg = f"Removido 1: {product['name']}"
-                
-                if item['quantity'] <= 0:
-                    self.cart.pop(i)
-                    msg = f"Eliminado: {product['name']}"
-                
-                self.update_ui()
-                self.app.left_panel.set_last_item(msg, COLOR_WARNING)
-                break
-        
-        if not found:
+        line = self.items.get(product['id'])
+        if line is None:
             messagebox.showwarning("No en Carrito", "Este producto no está en el carrito.")
             self.app.after(100, lambda: self.app.left_panel.focus_entry())
+            return
+
+        self._set_quantity(line, line['quantity'] - 1)
+        msg = f"Removido 1: {product['name']}"
+
+        if line['quantity'] <= 0:
+            del self.items[product['id']]
+            msg = f"Eliminado: {product['name']}"
+
+        self.update_ui()
+        self.app.left_panel.set_last_item(msg, COLOR_WARNING)
 
     def clear_cart(self) -> None:
         self.cart = []
@@ -58,37 +95,50 @@ class CartManager:
         self.app.left_panel.focus_entry()
 
     def update_ui(self) -> None:
-        self.app.left_panel.update_cart_display(self.cart)
-        
-        total_sum = sum(item['total'] for item in self.cart)
-        total_items = sum(item['quantity'] for item in self.cart)
-        self.app.right_panel.update_totals(total_sum, total_items)
+        self.app.left_panel.update_cart_display(self.items.values())
+        self.app.right_panel.update_totals(self.total_sum, self.total_items)
 
     def checkout(self) -> None:
-        if not self.cart: return
+        if not self.items: return
         
         # Check printer logic via app
         if not self.app.printer:
              messagebox.showwarning("Aviso", "Servicio de impresión no disponible (Modo Seguro)")
         
-        total_sum = sum(item['total'] for item in self.cart)
+        total_sum = self.total_sum
         
         def on_payment_confirmed(cash: float, change: float) -> None:
             # We need session ID. It's in session_manager now.
             # Assuming app has session_manager
             session_id = self.app.session_manager.current_session
+            items = self.cart
             
-            database.record_sale(session_id, self.cart, total_sum, "EFECTIVO")
+            sale_id = database.record_sale(session_id, items, total_sum, "EFECTIVO")
             
-            if self.app.printer:
-                success = self.app.printer.print_receipt(self.cart, total_sum, "EFECTIVO", cash, change)
-                if not success:
-                    messagebox.showwarning("Error de Impresora", "No se pudo imprimir el ticket, pero la venta se guardó.")
+            # The ticket is spooled and printed in the background, so a slow or
+            # jammed printer never holds up the next customer
+            status = ""
+            if self.app.print_queue:
+                try:
+                    payload = self.app.printer.build_receipt(items, total_sum, "EFECTIVO", cash, change)
+                    self.app.print_queue.submit(payload, sale_id)
+                    status = " (imprimiendo ticket...)"
+                except Exception as e:
+                    print(f"Error queuing receipt: {e}")
+                    status = " (ticket no impreso)"
             else:
-                 print("Impresión omitida (PrinterService es None)")
+                 print("Impresión omitida (PrintQueue es None)")
             
             self.clear_cart()
-            self.app.left_panel.set_last_item(f"Venta Completada! Cambio: ${change:.2f}", COLOR_SUCCESS)
+            self.app.left_panel.set_last_item(f"Venta Completada! Cambio: ${change:.2f}{status}", COLOR_SUCCESS)
             self.app.left_panel.focus_entry()
 
         CheckoutDialog(self.app, total_sum, on_payment_confirmed)
+
+    def on_print_status(self, job_id: int, status: str, attempts: int, error: Optional[str]) -> None:
+        """Called on the Tk thread with PrintQueue progress."""
+        if status == 'retry':
+            self.app.left_panel.set_last_item(f"Impresora no responde, reintentando ticket ({attempts}/{MAX_ATTEMPTS})", COLOR_WARNING)
+        elif status == 'failed':
+            messagebox.showwarning("Error de Impresora", "No se pudo imprimir el ticket, pero la venta se guardó.")
+            self.app.left_panel.focus_entry()
@@ -0,0 +1,45 @@
+import database
+from typing import Dict, Any, Optional
+
+class CatalogManager:
+    """
+    In-memory product catalog keyed by barcode for the scan hot path.
+    Coherence: database triggers bump catalog_version on any product change
+    (admin backend, PDF import, scripts); we poll that single row and reload
+    the catalog only when it changed.
+    """
+    POLL_INTERVAL_MS = 2000
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.products_by_barcode: Dict[str, Dict[str, Any]] = {}
+        self.version: Optional[int] = None
+
+    def load(self) -> None:
+        # Read the version first: a change racing with the load is picked up by the next poll
+        version = database.get_catalog_version()
+        self.products_by_barcode = {p['barcode']: p for p in database.get_all_products()}
+        self.version = version
+
+    def refresh_if_changed(self) -> bool:
+        try:
+            if database.get_catalog_version() != self.version:
+                self.load()
+                return True
+        except Exception as e:
+            print(f"Catalog refresh error: {e}")
+        return False
+
+    def start_polling(self) -> None:
+        self.app.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self) -> None:
+        self.refresh_if_changed()
+        self.app.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def get_product_by_barcode(self, barcode: str) -> Optional[Dict[str, Any]]:
+        product = self.products_by_barcode.get(barcode)
+        if product is None and self.refresh_if_changed():
+            # Product may have been added since the last poll
+            product = self.products_by_barcode.get(barcode)
+        return product
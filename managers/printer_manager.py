@@ -0,0 +1,68 @@
+import threading
+from typing import Any, Optional
+from printer_service import PrinterService
+from ui.styles import COLOR_SUCCESS, COLOR_DANGER
+
+class PrinterManager:
+    """
+    Creates the PrinterService from settings.json without enumerating printers.
+    The printer found by the last detection is cached under "printer_name" and
+    validated in the background after startup; detection runs again only when
+    it is missing, when printing fails, or on request (redetect).
+    """
+    VALIDATE_DELAY_MS = 1500
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.printer: Optional[PrinterService] = None
+
+    def create_printer(self) -> PrinterService:
+        settings = self.app.settings_manager
+        self.printer = PrinterService(settings.get("printer"),
+                                      printer_name=settings.get("printer_name"),
+                                      on_discovered=self._on_discovered)
+        return self.printer
+
+    def validate_later(self) -> None:
+        if self.printer and not self.printer.backend:
+            self.app.after(self.VALIDATE_DELAY_MS, lambda: self._run_in_background(self._validate))
+
+    def redetect(self) -> None:
+        """Explicit re-detection (admin action); reports the result in the UI."""
+        if not self.printer:
+            return
+        self.app.left_panel.set_last_item("Buscando impresora...", "gray")
+
+        def run() -> None:
+            name = self.printer.detect()
+            self.app.after(0, lambda: self._on_redetected(name))
+
+        self._run_in_background(run)
+
+    def _run_in_background(self, target) -> None:
+        threading.Thread(target=target, daemon=True).start()
+
+    def _validate(self) -> None:
+        cached = self.printer.printer_name
+        if cached and self.printer.is_available(cached):
+            return
+        print(f"Printer '{cached}' not available, detecting...")
+        self.printer.detect()
+
+    def _on_discovered(self, name: str) -> None:
+        # Called from worker threads: persist on the Tk thread
+        self.app.after(0, lambda: self._save_printer_name(name))
+
+    def _save_printer_name(self, name: str) -> None:
+        if self.app.settings_manager.get("printer_name") != name:
+            self.app.settings_manager.set("printer_name", name)
+
+    def _on_redetected(self, name: Optional[str]) -> None:
+        if name:
+            self.app.left_panel.set_last_item(f"Impresora: {name}", COLOR_SUCCESS)
+            # Tickets that gave up while the printer was missing get another chance
+            if self.app.print_queue:
+                self.app.print_queue.retry_failed()
+        else:
+            self.app.left_panel.set_last_item("No se encontró impresora", COLOR_DANGER)
+        self.app.left_panel.focus_entry()
@@ -6,6 +6,8 @@ import threading
 from tkinter import messagebox
 from typing import Optional, Any, Callable
 
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class ProcessManager:
     def __init__(self, app: Any):
         self.app = app
@@ -14,19 +16,10 @@ class ProcessManager:
     def start_backend(self) -> None:
         try:
             python_exe = sys.executable
-            # Assuming backend.py is in the parent directory of this file's package, 
-            # or we rely on the implementation where we know the path.
-            # Best to use app's root dir.
-            # self.app should be the POSApp instance which is in the root.
-            # But let's be robust.
-            root_dir = os.getcwd() # Or os.path.dirname(sys.modules['__main__'].__file__) if main is run.
-            # Actually, using os.getcwd() might be risky if cwd changed. 
-            # Ideally we pass base_path.
-            
-            script_path = os.path.join(root_dir, "backend.py")
-            if not os.path.exists(script_path):
-                 # Fallback if we are in managers dir? No, we shouldn't be running from there.
-                 pass
+            # Scripts live next to this package (root or versions/<v>/ with staged
+            # installs); the working directory (database, uploads) is the install root
+            script_path = os.path.join(CODE_DIR, "backend.py")
+            root_dir = os.getcwd()
 
             self.backend_process = subprocess.Popen([python_exe, script_path], cwd=root_dir)
             print(f"Backend started with PID: {self.backend_process.pid}")
@@ -49,9 +42,8 @@ class ProcessManager:
     def open_admin_view(self) -> None:
         try:
             python_exe = sys.executable
-            # Assuming admin_launcher.py is in the root
             root_dir = os.getcwd()
-            script_path = os.path.join(root_dir, "admin_launcher.py")
+            script_path = os.path.join(CODE_DIR, "admin_launcher.py")
             
             self.app.attributes('-disabled', True)
             
@@ -1,11 +1,120 @@
 import json
 import os
+import io
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pypdf import PdfReader
 import database
+from thumbnails import create_thumbnail, PRODUCT_IMAGE_FOLDER, PRODUCT_THUMB_FOLDER
 
-def import_inventory_from_pdf(pdf_path):
+IMAGE_DIR = PRODUCT_IMAGE_FOLDER
+THUMB_DIR = PRODUCT_THUMB_FOLDER  # Used by the POS preview (thumbnails.preview_path)
+IMAGE_WORKERS = 4
+MAX_PENDING_IMAGES = 16  # Bounds memory: attachments are read only as workers free up
+
+def _attachment_bytes(data):
+    # data is list of bytes in some versions, or bytes directly
+    if isinstance(data, list):
+        data = b"".join(data)
+    return data
+
+def _file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(65536):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def _save_product_image(data, target_path, thumb_path):
+    """
+    Writes one product image plus its thumbnail. Skips the write when the file
+    on disk already has the same content. Returns True if anything was written.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    unchanged = (os.path.exists(target_path)
+                 and os.path.getsize(target_path) == len(data)
+                 and _file_sha256(target_path) == digest)
+
+    if not unchanged:
+        # Own temp file per writer (same directory, so the rename stays atomic)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    if unchanged and os.path.exists(thumb_path):
+        return False
+
+    try:
+        create_thumbnail(io.BytesIO(data), thumb_path)
+    except Exception as e:
+        print(f"Thumbnail error for {target_path}: {e}")
+    return True
+
+def extract_product_images(attachments, products, progress_callback=None):
+    """
+    Saves the images referenced by `products` (inventory JSON entries) using a
+    thread pool. Returns {barcode: image path relative to static/}.
+    """
+    os.makedirs(THUMB_DIR, exist_ok=True)
+
+    jobs = []
+    for p in products:
+        image_filename = p.get('image_filename')
+        barcode = p.get('barcode')
+        if image_filename and image_filename in attachments:
+            jobs.append((barcode, image_filename))
+
+    saved = {}
+    written = 0
+    total = len(jobs)
+    done = 0
+    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+        pending = {}
+
+        def collect(futures):
+            nonlocal written, done
+            for future in futures:
+                barcode, image_path = pending.pop(future)
+                if future.result():
+                    written += 1
+                saved[barcode] = image_path
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+
+        for barcode, image_filename in jobs:
+            if len(pending) >= MAX_PENDING_IMAGES:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+
+            # Use barcode as filename to ensure uniqueness/consistency
+            ext = os.path.splitext(image_filename)[1]
+            target_filename = f"{barcode}{ext}"
+            data = _attachment_bytes(attachments[image_filename])
+            future = pool.submit(_save_product_image, data,
+                                 os.path.join(IMAGE_DIR, target_filename),
+                                 os.path.join(THUMB_DIR, f"{barcode}.jpg"))
+            # Path relative to static folder: "images/products/..."
+            pending[future] = (barcode, f"images/products/{target_filename}")
+
+        collect(list(pending))
+
+    print(f"PDF import: {total} images, {written} written, {total - written} unchanged")
+    return saved
+
+def import_inventory_from_pdf(pdf_path, progress_callback=None):
     """
     Imports products and images from the generated inventory PDF.
+    progress_callback(stage, done, total) is called while images ('imagenes')
+    and products ('productos') are written.
+    Safe to call from a worker thread (no UI access).
     """
     try:
         reader = PdfReader(pdf_path)
@@ -17,93 +126,58 @@ def import_inventory_from_pdf(pdf_path):
         # Note: pypdf structure for attachments can vary by version, but usually it's a dict
         # where keys are filenames and values are the bytes.
         
-        if not reader.attachments:
+        # Read the attachment table once; values are only decoded when accessed
+        attachments = reader.attachments
+        if not attachments:
              raise Exception("No attachments found in PDF")
 
         # Find inventory_db.json
-        for filename, data in reader.attachments.items():
-            if filename == 'inventory_db.json':
-                # data is list of bytes in some versions, or bytes directly
-                if isinstance(data, list):
-                    data = b"".join(data)
-                
-                # Try decoding with different encodings
+        data = attachments.get('inventory_db.json')
+        if data is not None:
+            data = _attachment_bytes(data)
+            
+            # Try decoding with different encodings
+            try:
+                json_str = data.decode('utf-8')
+            except UnicodeDecodeError:
                 try:
-                    json_str = data.decode('utf-8')
-                except UnicodeDecodeError:
+                    json_str = data.decode('latin-1')
+                except:
+                    # Fallback: try to find the JSON structure in raw bytes if pypdf added garbage
+                    # This is a heuristic if direct decoding fails
                     try:
-                        json_str = data.decode('latin-1')
+                        json_str = data.decode('utf-8', errors='ignore')
                     except:
-                        # Fallback: try to find the JSON structure in raw bytes if pypdf added garbage
-                        # This is a heuristic if direct decoding fails
-                        try:
-                            json_str = data.decode('utf-8', errors='ignore')
-                        except:
-                            raise Exception("Could not decode inventory_db.json")
+                        raise Exception("Could not decode inventory_db.json")
 
-                if not json_str or not json_str.strip():
-                    raise Exception("inventory_db.json is empty")
+            if not json_str or not json_str.strip():
+                raise Exception("inventory_db.json is empty")
 
-                try:
-                    json_data = json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    # Log first 100 chars to help debug
-                    snippet = json_str[:100] if json_str else "EMPTY"
-                    raise Exception(f"Invalid JSON format: {e}. Content snippet: '{snippet}'")
-                    
-                break
+            try:
+                json_data = json.loads(json_str)
+            except json.JSONDecodeError as e:
+                # Log first 100 chars to help debug
+                snippet = json_str[:100] if json_str else "EMPTY"
+                raise Exception(f"Invalid JSON format: {e}. Content snippet: '{snippet}'")
         
         if not json_data:
             raise Exception("inventory_db.json not found in PDF")
 
-        # 2. Process Products
-        imported_count = 0
-        updated_count = 0
-        
-        # Ensure images directory exists
-        img_dir = os.path.join("static", "images", "products")
-        os.makedirs(img_dir, exist_ok=True)
+        # 2. Extract Images (parallel, unchanged files skipped)
+        image_progress = (lambda d, t: progress_callback('imagenes', d, t)) if progress_callback else None
+        saved_images = extract_product_images(attachments, json_data, image_progress)
 
+        rows = []
         for p in json_data:
             barcode = p.get('barcode')
             name = p.get('name')
             price = float(p.get('price', 0))
-            image_filename = p.get('image_filename')
-            
-            # Save Image if exists
-            saved_image_path = None
-            if image_filename and image_filename in reader.attachments:
-                img_data = reader.attachments[image_filename]
-                if isinstance(img_data, list):
-                    img_data = b"".join(img_data)
-                
-                # Save to static/images/products/
-                # Use barcode as filename to ensure uniqueness/consistency
-                ext = os.path.splitext(image_filename)[1]
-                target_filename = f"{barcode}{ext}"
-                target_path = os.path.join(img_dir, target_filename)
-                
-                with open(target_path, "wb") as f:
-                    f.write(img_data)
-                
-                # Path relative to static folder for DB (or absolute? DB usually stores relative or full)
-                # Looking at database.py, it seems to store just the path. 
-                # Let's store relative to static folder: "images/products/..."
-                saved_image_path = f"images/products/{target_filename}"
-
-            # Update or Insert into DB
-            existing = database.get_product_by_barcode(barcode)
-            if existing:
-                # Update
-                # Only update image if we have a new one, otherwise keep existing?
-                # Or overwrite? Let's overwrite if we have one.
-                final_img_path = saved_image_path if saved_image_path else existing['image_path']
-                database.update_product(existing['id'], barcode, name, price, final_img_path)
-                updated_count += 1
-            else:
-                # Insert
-                database.add_product(barcode, name, price, saved_image_path)
-                imported_count += 1
+            # Existing products keep their image when the PDF has none (None -> keep)
+            rows.append((barcode, name, price, saved_images.get(barcode)))
+
+        # 3. Insert/Update everything in one transaction (all or nothing)
+        product_progress = (lambda d, t: progress_callback('productos', d, t)) if progress_callback else None
+        imported_count, updated_count = database.upsert_products(rows, product_progress)
 
         return True, f"Importado: {imported_count} nuevos, {updated_count} actualizados."
 
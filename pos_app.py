@@ -1,12 +1,23 @@
+import sys
+
+if __name__ == "__main__":
+    # Old shortcuts may start a copy that is no longer the active version. Hand
+    # off before importing anything else: this copy's modules may be stale.
+    import launcher
+    if launcher.is_inactive_copy(__file__):
+        sys.exit(launcher.run(sys.argv[1:]))
+
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog, filedialog
 import database
 from printer_service import PrinterService
+from print_queue import PrintQueue
 import datetime
 import subprocess
-import sys
 import os
 import atexit
+import threading
+import queue
 from typing import List, Dict, Optional, Any, Union, Tuple, Callable
 import json
 
@@ -24,12 +35,16 @@ from managers.settings_manager import SettingsManager
 from managers.process_manager import ProcessManager
 from managers.session_manager import SessionManager
 from managers.cart_manager import CartManager
+from managers.catalog_manager import CatalogManager
+from managers.printer_manager import PrinterManager
 
 # UI Configuration
 ctk.set_appearance_mode("Light")
 ctk.set_default_color_theme("blue")
 
 class POSApp(ctk.CTk):
+    IMPORT_POLL_MS = 100
+
     def __init__(self, safe_mode: bool = False):
         super().__init__(fg_color=COLOR_BACKGROUND) # Fluent Background
         self.safe_mode = safe_mode
@@ -42,10 +57,16 @@ class POSApp(ctk.CTk):
         self.process_manager = ProcessManager(self)
         self.session_manager = SessionManager(self)
         self.cart_manager = CartManager(self)
+        self.printer_manager = PrinterManager(self)
         
         # Initialize Database
         database.init_db()
         
+        # Product catalog cache (barcode -> product)
+        self.catalog_manager = CatalogManager(self)
+        self.catalog_manager.load()
+        self.catalog_manager.start_polling()
+        
         # Start Backend Server
         if not self.safe_mode:
             self.process_manager.start_backend()
@@ -60,10 +81,17 @@ class POSApp(ctk.CTk):
         
         # Services
         if not self.safe_mode:
-            self.printer: Optional[PrinterService] = PrinterService()
+            # Uses the printer cached in settings.json, validated after startup
+            self.printer: Optional[PrinterService] = self.printer_manager.create_printer()
+            # Receipts are spooled to the database and printed by a worker thread
+            self.print_queue: Optional[PrintQueue] = PrintQueue(
+                self.printer,
+                on_status=lambda *args: self.after(0, lambda: self.cart_manager.on_print_status(*args)))
+            self.print_queue.start()
         else:
             print("SKIPPING: Printer Service (Safe Mode)")
             self.printer = None
+            self.print_queue = None
             
         self.void_mode: bool = False 
         
@@ -84,6 +112,8 @@ class POSApp(ctk.CTk):
         self.bind("<Button-1>", lambda e: self.check_focus(e))
         self.bind("<F11>", lambda e: self.toggle_fullscreen(from_key=True))
 
+        self.printer_manager.validate_later()
+
         # Initialize Session (AFTER UI IS BUILT)
         self.session_manager.init_daily_session()
 
@@ -132,6 +162,9 @@ class POSApp(ctk.CTk):
         self.destroy()
 
     def destroy(self):
+        if self.print_queue:
+            self.print_queue.stop()
+            self.printer.close()
         self.process_manager.stop_backend()
         super().destroy()
 
@@ -172,7 +205,7 @@ class POSApp(ctk.CTk):
         self.left_panel.focus_entry()
 
     def process_barcode(self, barcode: str) -> None:
-        product = database.get_product_by_barcode(barcode)
+        product = self.catalog_manager.get_product_by_barcode(barcode)
         if not product:
             messagebox.showwarning("No Encontrado", f"Producto con código '{barcode}' no encontrado.")
             self.after(100, lambda: self.left_panel.focus_entry())
@@ -204,12 +237,15 @@ class POSApp(ctk.CTk):
     
 
 
+    def redetect_printer(self) -> None:
+        if not self.printer:
+            messagebox.showwarning("Aviso", "Servicio de impresión no disponible (Modo Seguro)")
+            return
+        self.printer_manager.redetect()
+
     def update_ui(self) -> None:
-        self.left_panel.update_cart_display(self.cart)
-        
-        total_sum = sum(item['total'] for item in self.cart)
-        total_items = sum(item['quantity'] for item in self.cart)
-        self.right_panel.update_totals(total_sum, total_items)
+        # Totals are maintained incrementally by the cart manager
+        self.cart_manager.update_ui()
 
     def import_inventory(self) -> None:
         # Keeping this here as discussed
@@ -228,22 +264,51 @@ class POSApp(ctk.CTk):
         if not file_path:
             return
 
-        try:
-            self.configure(cursor="wait")
-            self.update()
-            
-            success, message = import_inventory_from_pdf(file_path)
-            
+        # Run the import in a worker thread so the register stays responsive
+        self.configure(cursor="watch")
+        self.right_panel.btn_import.configure(state="disabled")
+        self.left_panel.set_last_item("Importando inventario...", COLOR_WARNING)
+
+        # The worker only puts events here; the Tk loop polls them (Tk is not thread-safe)
+        events: "queue.Queue[tuple]" = queue.Queue()
+
+        def on_progress(stage: str, done: int, total: int) -> None:
+            events.put(('progress', stage, done, total))
+
+        def on_finished(success: bool, message: str) -> None:
             self.configure(cursor="")
-            
+            self.right_panel.btn_import.configure(state="normal")
+            self.catalog_manager.refresh_if_changed()
+            self.left_panel.set_last_item("Listo para escanear", "gray")
+
             if success:
                 messagebox.showinfo("Éxito", message)
             else:
                 messagebox.showerror("Error de Importación", message)
-                
-        except Exception as e:
-            self.configure(cursor="")
-            messagebox.showerror("Error Crítico", f"Falló la importación: {e}")
+            self.left_panel.focus_entry()
+
+        def run_import() -> None:
+            try:
+                success, message = import_inventory_from_pdf(file_path, on_progress)
+            except Exception as e:
+                success, message = False, f"Falló la importación: {e}"
+            events.put(('finished', success, message))
+
+        def poll_import() -> None:
+            try:
+                while True:
+                    event = events.get_nowait()
+                    if event[0] == 'finished':
+                        on_finished(event[1], event[2])
+                        return
+                    _, stage, done, total = event
+                    self.left_panel.set_last_item(f"Importando {stage}... {done}/{total}", COLOR_WARNING)
+            except queue.Empty:
+                pass
+            self.after(self.IMPORT_POLL_MS, poll_import)
+
+        threading.Thread(target=run_import, daemon=True).start()
+        self.after(self.IMPORT_POLL_MS, poll_import)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="POS Application")
@@ -1,112 +1,157 @@
 import database
-import win32print
-from escpos.printer import Dummy
-from PIL import Image
+import argparse
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
 import barcode
 from barcode.writer import ImageWriter
-import os
+from printer_service import PrinterService
+from receipt_template import INIT, ESC, GS, ALIGN_CENTER, FEED_AND_CUT, CODEPAGES
 
-def get_automatic_printer_name():
-    try:
-        printers = [p[2] for p in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)]
-        for p in printers:
-            if "ThermalPrinter" in p: return p
-        
-        printers_2 = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS, None, 2)
-        for p in printers_2:
-            if "USB" in p[3] or "Generic" in p[4] or "Text Only" in p[4]:
-                return p[1]
-    except:
-        pass
-    return None
-
-def print_product_label(printer_name, product):
+LABEL_MAX_WIDTH = 300   # px, fits 58 mm paper (384 dots) with margin
+LABEL_CODEPAGE = 'cp850'
+LABELS_PER_JOB = 50     # Labels sent per printer job
+
+def raster_image(img):
     """
-    Prints a single product label with Name, Price, and Barcode.
+    Encodes a PIL image as an ESC/POS raster bit image (GS v 0).
+    Dark pixels are printed; the width is padded to a whole byte.
+    """
+    gray = img.convert('L')
+    width = (gray.width + 7) // 8 * 8
+    if width != gray.width:
+        padded = Image.new('L', (width, gray.height), 255)
+        padded.paste(gray, (0, 0))
+        gray = padded
+    # Mode '1' packs 8 pixels per byte with 1 = white, so invert first: 1 = dot
+    bits = ImageOps.invert(gray).point(lambda v: 255 if v >= 128 else 0).convert('1')
+    width_bytes = width // 8
+    header = GS + b'v0\x00' + bytes([width_bytes & 0xFF, width_bytes >> 8, bits.height & 0xFF, bits.height >> 8])
+    return header + bits.tobytes()
+
+def render_label(product):
+    """
+    Renders one label (name, price, barcode) to ESC/POS bytes, fully in memory.
+    Top-level so it can run in a worker process.
+    Returns None (after logging) if the label can't be rendered, e.g. a barcode
+    with characters Code128 doesn't support, so the rest of the batch still prints.
     """
-    print(f"Printing label for: {product['name']}")
-    
-    # Generate Barcode Image
-    code_text = product['barcode']
-    
-    # Use Code128 for flexibility
-    BARCODE_CLASS = barcode.get_barcode_class('code128')
-    my_barcode = BARCODE_CLASS(code_text, writer=ImageWriter())
-    
-    # Save to temp file
-    filename = f"temp_barcode_{code_text}"
-    fullname = my_barcode.save(filename)
-    
     try:
-        dummy = Dummy()
-        dummy.hw("INIT")
-        dummy.set(align='center')
-        
-        # Product Info
-        dummy.text(f"{product['name'][:30]}\n")
-        dummy.text(f"${product['price']:.2f}\n")
-        
-        # Resize image to fit printer (max ~380px)
-        img = Image.open(fullname)
-        max_width = 300
-        if img.width > max_width:
-            ratio = max_width / img.width
-            new_height = int(img.height * ratio)
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            img.save("temp_resized_label.png")
-            fullname = "temp_resized_label.png"
-            
-        dummy.image(fullname, impl="bitImageRaster")
-        dummy.text("\n\n") # Space between labels
-        dummy.cut()
-        
-        raw_data = dummy.output
-        
-        hPrinter = win32print.OpenPrinter(printer_name)
-        try:
-            hJob = win32print.StartDocPrinter(hPrinter, 1, ("Label", None, "RAW"))
-            try:
-                win32print.StartPagePrinter(hPrinter)
-                win32print.WritePrinter(hPrinter, raw_data)
-                win32print.EndPagePrinter(hPrinter)
-            finally:
-                win32print.EndDocPrinter(hPrinter)
-        finally:
-            win32print.ClosePrinter(hPrinter)
-            
+        return _render_label(product)
     except Exception as e:
-        print(f"Error printing label: {e}")
-    finally:
-        # Cleanup temp files
-        try:
-            if os.path.exists(filename + ".png"): os.remove(filename + ".png")
-            if os.path.exists("temp_resized_label.png"): os.remove("temp_resized_label.png")
-        except:
-            pass
+        print(f"Error printing label for {product['name']}: {e}")
+        return None
+
+def _render_label(product):
+    # Use Code128 for flexibility
+    BARCODE_CLASS = barcode.get_barcode_class('code128')
+    fp = io.BytesIO()
+    BARCODE_CLASS(product['barcode'], writer=ImageWriter()).write(fp)
+    fp.seek(0)
+
+    img = Image.open(fp)
+    # Resize image to fit printer
+    if img.width > LABEL_MAX_WIDTH:
+        ratio = LABEL_MAX_WIDTH / img.width
+        img = img.resize((LABEL_MAX_WIDTH, int(img.height * ratio)), Image.Resampling.LANCZOS)
+
+    text = f"{product['name'][:30]}\n${product['price']:.2f}\n"
+    return b''.join([
+        ALIGN_CENTER,
+        text.encode(LABEL_CODEPAGE, errors='replace'),
+        raster_image(img),
+        b"\n\n",  # Space between labels
+        FEED_AND_CUT,
+    ])
+
+def iter_jobs(labels, labels_per_job=LABELS_PER_JOB):
+    """Groups rendered labels into multi-label jobs (one printer round trip each)."""
+    prefix = INIT + ESC + b't' + bytes([CODEPAGES[LABEL_CODEPAGE]])
+    chunk = []
+    for label in labels:
+        chunk.append(label)
+        if len(chunk) == labels_per_job:
+            yield prefix + b''.join(chunk), len(chunk)
+            chunk = []
+    if chunk:
+        yield prefix + b''.join(chunk), len(chunk)
+
+def print_labels(products, send, workers=None, labels_per_job=LABELS_PER_JOB):
+    """
+    Renders labels in a process pool and passes each job's bytes to send(data).
+    Jobs are sent as soon as their labels are ready, in product order.
+    Labels that fail to render are skipped and reported at the end.
+    Returns (printed count, list of skipped products).
+    """
+    printed = 0
+    skipped = []
+
+    def rendered(labels):
+        for product, label in zip(products, labels):
+            if label is None:
+                skipped.append(product)
+            else:
+                yield label
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        labels = pool.map(render_label, products, chunksize=16)
+        for data, count in iter_jobs(rendered(labels), labels_per_job):
+            send(data)
+            printed += count
+            print(f"Sent {printed}/{len(products)} labels")
+
+    if skipped:
+        print(f"Skipped {len(skipped)} labels that could not be rendered:")
+        for product in skipped:
+            print(f"  id {product['id']}: {product['name']} ({product['barcode']})")
+    return printed, skipped
+
+def get_printer():
+    from managers.settings_manager import SettingsManager
+    settings = SettingsManager()
+    printer = PrinterService(settings.get("printer"), printer_name=settings.get("printer_name"))
+    if not printer.printer_name:
+        printer.detect()
+    return printer
 
 def main():
+    parser = argparse.ArgumentParser(description="Print barcode labels for the product catalog")
+    parser.add_argument("--since", help="Only products added/changed since this date (YYYY-MM-DD[THH:MM:SS])")
+    parser.add_argument("--ids", help="Comma separated product ids, e.g. 1,5,42")
+    parser.add_argument("--output", help="Write the ESC/POS data to this file instead of the printer")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--per-job", type=int, default=LABELS_PER_JOB, help="Labels per printer job")
+    args = parser.parse_args()
+
     print("Printing Product Catalog Barcodes...")
-    
-    printer_name = get_automatic_printer_name()
-    if not printer_name:
-        print("Printer not found.")
-        return
-    
-    print(f"Using Printer: {printer_name}")
-    
-    conn = database.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products")
-    products = cursor.fetchall()
-    conn.close()
-    
+
+    ids = None
+    if args.ids:
+        try:
+            ids = [int(i) for i in args.ids.split(",") if i.strip()]
+        except ValueError:
+            parser.error("--ids must be a comma separated list of numbers")
+
+    products = database.get_products_for_labels(since=args.since, ids=ids)
     if not products:
         print("No products found in database. Run seed_data.py first.")
         return
 
-    for p in products:
-        print_product_label(printer_name, p)
-        
+    if args.output:
+        with open(args.output, "wb") as f:
+            print_labels(products, f.write, args.workers, args.per_job)
+        print(f"Done! Labels written to {args.output}")
+        return
+
+    printer = get_printer()
+    if not printer.printer_name:
+        print("Printer not found.")
+        sys.exit(1)
+
+    print(f"Using Printer: {printer.printer_name}")
+    print_labels(products, printer.send_raw, args.workers, args.per_job)
+    printer.close()
     print("Done! All labels sent to printer.")
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+import threading
+import time
+import database
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 2.0   # Seconds before the first retry, doubled on each failure
+BACKOFF_MAX = 60.0
+FAILED_RETENTION_DAYS = 7  # Failed jobs can be retried until then, then they're pruned
+
+class PrintQueue:
+    """
+    Prints spooled jobs (database.print_jobs) on a background thread, in order.
+    Failed jobs are retried with exponential backoff and marked 'failed' after
+    MAX_ATTEMPTS. Jobs still pending at startup (crash, power loss) are resumed;
+    failed jobs older than FAILED_RETENTION_DAYS are deleted at startup.
+
+    on_status(job_id, status, attempts, error) is called from the worker thread
+    with status 'printed', 'retry' or 'failed'.
+    """
+
+    def __init__(self, printer, on_status=None):
+        self.printer = printer
+        self.on_status = on_status
+        self.condition = threading.Condition()
+        self.running = False
+        self.wake_requested = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        try:
+            pruned = database.prune_failed_print_jobs(FAILED_RETENTION_DAYS)
+            if pruned:
+                print(f"Print queue: removed {pruned} old failed jobs")
+        except Exception as e:
+            print(f"Print queue error: {e}")
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="print-queue", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def submit(self, payload, sale_id=None):
+        """Spools raw printer bytes and returns immediately with the job id."""
+        job_id = database.enqueue_print_job(payload, sale_id)
+        self.wake()
+        return job_id
+
+    def retry_failed(self):
+        """Puts jobs that exhausted their attempts back in the queue."""
+        count = database.requeue_failed_print_jobs()
+        if count:
+            self.wake()
+        return count
+
+    def wake(self):
+        with self.condition:
+            self.wake_requested = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                self.wake_requested = False
+
+            try:
+                jobs = database.get_pending_print_jobs()
+            except Exception as e:
+                print(f"Print queue error: {e}")
+                jobs = []
+
+            with self.condition:
+                if not self.running:
+                    return
+                if self.wake_requested:
+                    # A job was submitted while reading the spool
+                    continue
+                if not jobs:
+                    self.condition.wait()
+                    continue
+                # Receipts come out in order: wait for the oldest job's next attempt
+                delay = jobs[0]['next_attempt_at'] - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+
+            try:
+                self._process(jobs[0])
+            except Exception as e:
+                print(f"Print queue error: {e}")
+                time.sleep(BACKOFF_BASE)
+
+    def _process(self, job):
+        try:
+            self.printer.send_raw(job['payload'])
+        except Exception as e:
+            attempts = job['attempts'] + 1
+            error = str(e)
+            print(f"Print job {job['id']} failed (attempt {attempts}): {error}")
+            if attempts >= MAX_ATTEMPTS:
+                database.fail_print_job(job['id'], attempts, error)
+                self._notify(job['id'], 'failed', attempts, error)
+            else:
+                delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+                database.reschedule_print_job(job['id'], attempts, time.time() + delay, error)
+                self._notify(job['id'], 'retry', attempts, error)
+            return
+
+        database.complete_print_job(job['id'])
+        self._notify(job['id'], 'printed', job['attempts'] + 1, None)
+
+    def _notify(self, job_id, status, attempts, error):
+        if self.on_status:
+            try:
+                self.on_status(job_id, status, attempts, error)
+            except Exception as e:
+                print(f"Print queue status callback error: {e}")
@@ -1,15 +1,194 @@
 import sys
 import subprocess
+import socket
+import select
+import threading
 try:
     import win32print
 except ImportError:
     win32print = None
-from escpos.printer import Dummy
-import datetime
+from receipt_template import ReceiptTemplate, PAPER_COLUMNS, CODEPAGES
+
+RAW_PORT = 9100
+SOCKET_TIMEOUT = 5.0
+DEFAULT_PAPER_WIDTH = 58
+DEFAULT_CODEPAGE = 'cp850'
+LP_TIMEOUT = 30.0  # A hung lp must not block the print queue worker
+LPSTAT_TIMEOUT = 5.0  # Same for CUPS queries during validation/detection
+
+class DeviceBackend:
+    """
+    Writes straight to a character device (/dev/usb/lp0), a FIFO or a plain
+    file (for testing). The handle stays open between receipts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def _open(self):
+        # Append mode: harmless for devices/FIFOs, keeps earlier output for files
+        self.handle = open(self.path, 'ab', buffering=0)
+
+    def write(self, data):
+        view = memoryview(data)
+        sent = 0
+        for attempt in (1, 2):
+            try:
+                if self.handle is None:
+                    self._open()
+                # Unbuffered writes may be short on devices and FIFOs
+                while sent < len(view):
+                    written = self.handle.write(view[sent:])
+                    if not written:
+                        raise OSError("device accepted no data")
+                    sent += written
+                return
+            except OSError as e:
+                # Printer unplugged/power cycled: the old handle is dead, reopen once
+                # and send only what is left
+                self.close()
+                if attempt == 2:
+                    raise RuntimeError(f"Device {self.path}: {e}")
+
+    def close(self):
+        if self.handle:
+            try:
+                self.handle.close()
+            except OSError:
+                pass
+            self.handle = None
+
+class SocketBackend:
+    """Raw ESC/POS over TCP (port 9100 / JetDirect) with a persistent connection."""
+
+    def __init__(self, host, port=RAW_PORT, timeout=SOCKET_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def write(self, data):
+        for attempt in (1, 2):
+            try:
+                if self.sock is not None and self._peer_closed():
+                    self.close()
+                if self.sock is None:
+                    self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                self.sock.sendall(data)
+                return
+            except OSError as e:
+                # Printers drop idle connections: reconnect once before failing
+                self.close()
+                if attempt == 2:
+                    raise RuntimeError(f"Socket {self.host}:{self.port}: {e}")
+
+    def _peer_closed(self):
+        # sendall() on a connection the printer already closed still "succeeds"
+        # and the data is lost, so check for EOF before writing
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self.sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+def create_backend(config):
+    """
+    Builds a direct backend from the "printer" entry of settings.json, e.g.
+    {"backend": "device", "device": "/dev/usb/lp0"}
+    {"backend": "socket", "host": "192.168.1.50", "port": 9100}
+    {"backend": "file", "path": "/tmp/receipts.bin"}
+    Optional keys for any backend: "paper_width" (58 or 80) and "codepage" (e.g. "cp850").
+    Returns None for "auto"/"system" (CUPS or win32print).
+    """
+    backend = (config or {}).get('backend', 'auto')
+    if backend == 'device':
+        return DeviceBackend(config.get('device', '/dev/usb/lp0'))
+    if backend == 'file':
+        return DeviceBackend(config['path'])
+    if backend == 'socket':
+        return SocketBackend(config['host'], int(config.get('port', RAW_PORT)))
+    if backend not in ('auto', 'system'):
+        print(f"Unknown printer backend '{backend}', using system printer")
+    return None
+
+def receipt_template_from_config(config):
+    """
+    ReceiptTemplate for the "paper_width" (58/80 mm) and "codepage" entries of
+    the printer settings. Bad values fall back to 58 mm / cp850 with a warning
+    instead of stopping the app at startup.
+    """
+    config = config or {}
+    try:
+        paper_width = int(config.get('paper_width', DEFAULT_PAPER_WIDTH))
+    except (TypeError, ValueError):
+        paper_width = None
+    if paper_width not in PAPER_COLUMNS:
+        print(f"Warning: unsupported paper_width {config.get('paper_width')!r}, using {DEFAULT_PAPER_WIDTH} mm")
+        paper_width = DEFAULT_PAPER_WIDTH
+
+    codepage = config.get('codepage', DEFAULT_CODEPAGE)
+    if codepage not in CODEPAGES:
+        print(f"Warning: unsupported codepage {codepage!r}, using {DEFAULT_CODEPAGE}")
+        codepage = DEFAULT_CODEPAGE
+    return ReceiptTemplate(paper_width, codepage)
 
 class PrinterService:
-    def __init__(self):
-        self.printer_name = self._find_printer()
+    def __init__(self, config=None, printer_name=None, on_discovered=None):
+        """
+        printer_name: system printer found on a previous run (settings.json).
+        Enumeration is skipped at startup; detect() runs when there is no cached
+        name or when printing fails and the cached printer is gone.
+        on_discovered(name) is called (from the calling thread) after detection.
+        """
+        self.backend = create_backend(config)
+        self.template = receipt_template_from_config(config)
+        self.lock = threading.Lock()
+        self.on_discovered = on_discovered
+        if self.backend:
+            self.printer_name = getattr(self.backend, 'path', None) or f"{self.backend.host}:{self.backend.port}"
+        else:
+            self.printer_name = printer_name
+
+    def detect(self):
+        """Enumerates system printers again and returns the selected one (or None)."""
+        if self.backend:
+            return self.printer_name
+        name = self._find_printer()
+        self.printer_name = name
+        if name and self.on_discovered:
+            self.on_discovered(name)
+        return name
+
+    def is_available(self, name=None):
+        """Cheap check that a system printer still exists (no full enumeration)."""
+        name = name or self.printer_name
+        if self.backend:
+            return True
+        if not name:
+            return False
+        try:
+            if sys.platform == 'win32':
+                if not win32print:
+                    return False
+                win32print.ClosePrinter(win32print.OpenPrinter(name))
+                return True
+            result = subprocess.run(['lpstat', '-p', name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    timeout=LPSTAT_TIMEOUT)
+            return result.returncode == 0
+        except Exception:
+            # Includes subprocess.TimeoutExpired: a hung CUPS counts as not available
+            return False
         
     def _find_printer(self):
         """
@@ -40,7 +219,7 @@ class PrinterService:
             try:
                 # 1. Try to find a default printer
                 try:
-                    result = subprocess.check_output(['lpstat', '-d'], stderr=subprocess.STDOUT).decode('utf-8')
+                    result = subprocess.check_output(['lpstat', '-d'], stderr=subprocess.STDOUT, timeout=LPSTAT_TIMEOUT).decode('utf-8')
                     if "system default destination:" in result:
                         printer = result.split(":")[1].strip()
                         if printer and printer != "no system default destination":
@@ -50,7 +229,7 @@ class PrinterService:
 
                 # 2. Look for any printer that might be a POS printer
                 # lpstat -a lists all accepting printers
-                result = subprocess.check_output(['lpstat', '-a'], stderr=subprocess.STDOUT).decode('utf-8')
+                result = subprocess.check_output(['lpstat', '-a'], stderr=subprocess.STDOUT, timeout=LPSTAT_TIMEOUT).decode('utf-8')
                 for line in result.splitlines():
                     # Format: "PrinterName accepting requests since..."
                     parts = line.split()
@@ -71,91 +250,89 @@ class PrinterService:
         
         return None
 
-    def print_receipt(self, items, total, payment_method, cash_given=0, change=0):
+    def build_receipt(self, items, total, payment_method, cash_given=0, change=0):
         """
+        Renders a receipt to raw ESC/POS bytes.
         items: list of dicts {'name', 'quantity', 'price', 'total'}
         """
+        return self.template.render(items, total, payment_method, cash_given, change)
+
+    def send_raw(self, raw_data):
+        """
+        Sends raw ESC/POS bytes to the printer. Raises RuntimeError on failure
+        (PrintQueue uses the message for its retry log).
+        """
+        if self.backend:
+            with self.lock:
+                self.backend.write(raw_data)
+            return
+
         if not self.printer_name:
-            print("No printer found. Skipping print.")
-            return False
+            self.detect()
+        if not self.printer_name:
+            raise RuntimeError("No printer found")
 
         try:
-            dummy = Dummy()
-            
-            # Header
-            dummy.hw("INIT")
-            dummy.set(align='center')
-            dummy.text("PUNTO DE VENTA\n")
-            dummy.text("--------------------------------\n")
-            dummy.text(f"{datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-            dummy.text("--------------------------------\n")
-            dummy.set(align='left')
-            
-            # Items
-            for item in items:
-                # Format: Qty x Name ... Total
-                # Truncate name if too long
-                name = item['name'][:20]
-                line = f"{item['quantity']} x {name:<20} ${item['total']:.2f}\n"
-                dummy.text(line)
+            self._send_system(raw_data)
+        except Exception:
+            # The cached printer may have been removed or renamed: re-probe so the
+            # next attempt goes to whatever is connected now
+            if not self.is_available():
+                self.detect()
+            raise
+
+    def _send_system(self, raw_data):
+        if sys.platform == 'win32':
+            if not win32print:
+                raise RuntimeError("win32print not available")
                 
-            dummy.text("--------------------------------\n")
-            
-            # Totals
-            dummy.set(align='right')
-            dummy.text(f"TOTAL: ${total:.2f}\n")
-            dummy.text(f"PAGO: {payment_method}\n")
-            if payment_method == "EFECTIVO":
-                dummy.text(f"RECIBIDO: ${cash_given:.2f}\n")
-                dummy.text(f"CAMBIO: ${change:.2f}\n")
-            
-            dummy.set(align='center')
-            dummy.text("\nGracias por su compra!\n")
-            dummy.text("\n") # Reduced spacing
-            dummy.cut()
-            
-            # Send to Printer
-            raw_data = dummy.output
-            
-            if sys.platform == 'win32':
-                if not win32print:
-                    print("win32print not available")
-                    return False
-                    
-                hPrinter = win32print.OpenPrinter(self.printer_name)
+            hPrinter = win32print.OpenPrinter(self.printer_name)
+            try:
+                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Receipt", None, "RAW"))
                 try:
-                    hJob = win32print.StartDocPrinter(hPrinter, 1, ("Receipt", None, "RAW"))
-                    try:
-                        win32print.StartPagePrinter(hPrinter)
-                        win32print.WritePrinter(hPrinter, raw_data)
-                        win32print.EndPagePrinter(hPrinter)
-                    finally:
-                        win32print.EndDocPrinter(hPrinter)
+                    win32print.StartPagePrinter(hPrinter)
+                    win32print.WritePrinter(hPrinter, raw_data)
+                    win32print.EndPagePrinter(hPrinter)
                 finally:
-                    win32print.ClosePrinter(hPrinter)
-            else:
-                # Linux implementation using lp command
-                # -d specifies destination, -o raw sends raw bytes (crucial for ESC/POS)
-                cmd = ['lp', '-d', self.printer_name, '-o', 'raw']
-                try:
-                    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdout, stderr = process.communicate(input=raw_data)
-                    if process.returncode != 0:
-                        print(f"lp error: {stderr.decode('utf-8')}")
-                        return False
-                except Exception as e:
-                    print(f"Error executing lp: {e}")
-                    return False
-                
+                    win32print.EndDocPrinter(hPrinter)
+            finally:
+                win32print.ClosePrinter(hPrinter)
+        else:
+            # Linux implementation using lp command
+            # -d specifies destination, -o raw sends raw bytes (crucial for ESC/POS)
+            cmd = ['lp', '-d', self.printer_name, '-o', 'raw']
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                stdout, stderr = process.communicate(input=raw_data, timeout=LP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise RuntimeError(f"lp did not finish within {LP_TIMEOUT:.0f}s")
+            if process.returncode != 0:
+                raise RuntimeError(f"lp error: {stderr.decode('utf-8', 'replace').strip()}")
+
+    def print_receipt(self, items, total, payment_method, cash_given=0, change=0):
+        """
+        Prints a receipt synchronously. The POS app goes through PrintQueue instead.
+        """
+        try:
+            self.send_raw(self.build_receipt(items, total, payment_method, cash_given, change))
             return True
-            
         except Exception as e:
             print(f"Printing error: {e}")
             return False
 
+    def close(self):
+        if self.backend:
+            with self.lock:
+                self.backend.close()
+
 if __name__ == "__main__":
-    # Test
-    ps = PrinterService()
+    # Test (uses the "printer" entry of settings.json when present)
+    from managers.settings_manager import SettingsManager
+    ps = PrinterService(SettingsManager().get("printer"))
+    if not ps.printer_name:
+        ps.detect()
     print(f"Found printer: {ps.printer_name}")
     if ps.printer_name:
         items = [
@@ -0,0 +1,92 @@
+import datetime
+
+# ESC/POS commands
+ESC = b'\x1b'
+GS = b'\x1d'
+INIT = ESC + b'@'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+ALIGN_RIGHT = ESC + b'a\x02'
+FEED_AND_CUT = ESC + b'd\x06' + GS + b'V\x00'  # Feed 6 lines, full cut
+
+# Characters per line in the default font (Font A, 12x24)
+PAPER_COLUMNS = {58: 32, 80: 48}
+
+# Python codec -> ESC t table number (Epson numbering, shared by most clones)
+CODEPAGES = {
+    'cp437': 0,
+    'cp850': 2,
+    'cp860': 3,
+    'cp863': 4,
+    'cp865': 5,
+    'cp1252': 16,
+    'cp866': 17,
+    'cp852': 18,
+    'cp858': 19,
+}
+
+class ReceiptTemplate:
+    """
+    Sale receipt with the static parts (init, codepage, header, separators,
+    footer, cut) encoded once. render() only encodes the date, item lines and
+    totals and joins the buffers, and is deterministic for a given timestamp,
+    so its output can be compared byte for byte.
+    """
+
+    def __init__(self, paper_width=58, codepage='cp850', title="PUNTO DE VENTA", footer="Gracias por su compra!"):
+        if paper_width not in PAPER_COLUMNS:
+            raise ValueError(f"Unsupported paper width: {paper_width} mm")
+        if codepage not in CODEPAGES:
+            raise ValueError(f"Unsupported codepage: {codepage}")
+
+        self.columns = PAPER_COLUMNS[paper_width]
+        self.codepage = codepage
+
+        separator = self.encode("-" * self.columns + "\n")
+        self.header = b''.join([
+            INIT,
+            ESC + b't' + bytes([CODEPAGES[codepage]]),
+            ALIGN_CENTER,
+            self.encode(title[:self.columns] + "\n"),
+            separator,
+        ])
+        self.before_items = separator + ALIGN_LEFT
+        self.before_totals = separator + ALIGN_RIGHT
+        self.footer = ALIGN_CENTER + self.encode(f"\n{footer}\n\n") + FEED_AND_CUT
+
+    def encode(self, text):
+        return text.encode(self.codepage, errors='replace')
+
+    def item_line(self, item):
+        # "2 x Coca Cola 600ml      $36.00": name is cut so the amount stays on the line
+        amount = f" ${item['total']:.2f}"
+        prefix = f"{item['quantity']} x "
+        name_width = max(self.columns - len(prefix) - len(amount), 0)
+        return self.encode(f"{prefix}{item['name'][:name_width]:<{name_width}}{amount}\n")
+
+    def render(self, items, total, payment_method, cash_given=0, change=0, timestamp=None):
+        """
+        items: list of dicts {'name', 'quantity', 'total'}
+        timestamp: datetime printed on the receipt (now by default)
+        """
+        timestamp = timestamp or datetime.datetime.now()
+        parts = [self.header, self.encode(timestamp.strftime('%d/%m/%Y %H:%M:%S') + "\n"), self.before_items]
+        parts.extend(self.item_line(item) for item in items)
+        parts.append(self.before_totals)
+
+        totals = f"TOTAL: ${total:.2f}\nPAGO: {payment_method}\n"
+        if payment_method == "EFECTIVO":
+            totals += f"RECIBIDO: ${cash_given:.2f}\nCAMBIO: ${change:.2f}\n"
+        parts.append(self.encode(totals))
+        parts.append(self.footer)
+        return b''.join(parts)
+
+if __name__ == "__main__":
+    # Prints a sample receipt as text (control bytes escaped) for quick inspection
+    template = ReceiptTemplate(58)
+    items = [
+        {'name': 'Test Product A', 'quantity': 2, 'total': 21.00},
+        {'name': 'Refresco de naranja 600ml retornable', 'quantity': 1, 'total': 18.00},
+    ]
+    data = template.render(items, 39.00, "EFECTIVO", 50.00, 11.00, datetime.datetime(2024, 1, 1, 12, 0, 0))
+    print(data.decode('cp850').encode('unicode_escape').decode('ascii').replace('\\n', '\n'))
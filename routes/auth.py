@@ -6,7 +6,7 @@ auth_bp = Blueprint('auth', __name__)
 
 ADMIN_PASSWORD = "admin123"
 
-# Active Clients Tracking moved to backend.py
+# Active Clients Tracking lives in routes/status.py
 
 def is_localhost():
     """Check if request comes from localhost"""
@@ -2,15 +2,19 @@ from flask import Blueprint, request, jsonify, send_file, send_from_directory, c
 import database
 import io
 import os
+import math
+import hashlib
+from functools import lru_cache
 import barcode
 from barcode.writer import ImageWriter
 from routes.auth import login_required
-from PIL import Image
+from PIL import Image, ImageChops
 from werkzeug.utils import secure_filename
+from thumbnails import (UPLOAD_FOLDER, UPLOAD_THUMB_SIZES, UPLOAD_THUMB_FORMATS,
+                        upload_thumbnail_path, create_upload_thumbnails, queue_upload_thumbnails)
 
 products_bp = Blueprint('products', __name__)
 
-UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
@@ -29,59 +33,93 @@ def save_image(file):
             os.makedirs(UPLOAD_FOLDER)
             
         file.save(os.path.join(UPLOAD_FOLDER, unique_filename))
+        queue_upload_thumbnails(unique_filename)
         return unique_filename
     return None
 
+UPLOAD_MAX_AGE = 31536000  # Upload names are unique, variants only change with the original
+
 @products_bp.route('/api/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(os.path.abspath(UPLOAD_FOLDER), filename)
+    size = request.args.get('size', type=int)
+    if size is None:
+        return send_from_directory(os.path.abspath(UPLOAD_FOLDER), filename)
+
+    # Smallest generated variant that covers the requested size
+    size = next((s for s in UPLOAD_THUMB_SIZES if s >= size), UPLOAD_THUMB_SIZES[-1])
+    ext = 'webp' if 'webp' in UPLOAD_THUMB_FORMATS and request.accept_mimetypes['image/webp'] else 'jpg'
+    filename = secure_filename(filename)
+    thumb_path = upload_thumbnail_path(filename, size, ext)
+
+    if not os.path.exists(thumb_path):
+        # Not generated yet (upload still queued, or backfill not run)
+        if not os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+            return "Not found", 404
+        try:
+            create_upload_thumbnails(filename)
+        except Exception as e:
+            print(f"Error creating thumbnails for {filename}: {e}")
+            return send_from_directory(os.path.abspath(UPLOAD_FOLDER), filename)
+
+    response = send_file(os.path.abspath(thumb_path), max_age=UPLOAD_MAX_AGE, conditional=True)
+    response.vary.add('Accept')
+    return response
+
+BARCODE_CACHE_SIZE = 256
+BARCODE_MODULE_HEIGHT_RANGE = (5.0, 50.0)  # mm; bounds image size and cache keys
+BARCODE_MAX_AGE = 86400  # Rendering is deterministic for (code, options)
+
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def render_barcode_png(code, module_height=15.0, quiet_zone=1):
+    """Renders a Code128 barcode as PNG bytes with a transparent background."""
+    # Code128 is flexible. 
+    # options: write_text=False to hide text.
+    # module_height: default is 15mm. User wants ~3cm (30mm).
+    # module_width: default is 0.2mm.
+    EAN = barcode.get_barcode_class('code128')
+    ean = EAN(code, writer=ImageWriter())
+    
+    # Render to BytesIO first
+    fp = io.BytesIO()
+    # write_text=False disables the number
+    # quiet_zone=1 ensures we don't have massive whitespace
+    ean.write(fp, options={'write_text': False, 'quiet_zone': quiet_zone, 'module_height': module_height})
+    fp.seek(0)
+    
+    # Post-process for Transparency using Pillow band operations (no per-pixel Python loop):
+    # a pixel is background if R, G and B are all > 240
+    img = Image.open(fp).convert("RGB")
+    r, g, b = (band.point(lambda v: 255 if v > 240 else 0) for band in img.split())
+    background = ImageChops.multiply(ImageChops.multiply(r, g), b)
+    img.putalpha(ImageChops.invert(background))
+    
+    final_fp = io.BytesIO()
+    img.save(final_fp, format="PNG")
+    return final_fp.getvalue()
 
 @products_bp.route('/api/preview_barcode')
 def preview_barcode():
     code = request.args.get('code')
     if not code:
         return "Missing code", 400
+    module_height = request.args.get('module_height', 15.0, type=float)
+    if not math.isfinite(module_height):
+        module_height = 15.0
+    low, high = BARCODE_MODULE_HEIGHT_RANGE
+    # Rounded so arbitrary decimals can't bypass the render cache
+    module_height = round(min(max(module_height, low), high), 1)
     
     try:
-        # Generate Barcode Image
-        # Code128 is flexible. 
-        # options: write_text=False to hide text.
-        # module_height: default is 15mm. User wants ~3cm (30mm).
-        # module_width: default is 0.2mm.
-        
-        EAN = barcode.get_barcode_class('code128')
-        ean = EAN(code, writer=ImageWriter())
-        
-        # Render to BytesIO first
-        fp = io.BytesIO()
-        # write_text=False disables the number
-        # quiet_zone=1 ensures we don't have massive whitespace
-        ean.write(fp, options={'write_text': False, 'quiet_zone': 1, 'module_height': 15.0})
-        fp.seek(0)
-        
-        # Post-process for Transparency using Pillow
-        img = Image.open(fp).convert("RGBA")
-        
-        # Make white background transparent
-        datas = img.getdata()
-        new_data = []
-        for item in datas:
-            # If pixel is white (or very close), make it transparent
-            if item[0] > 240 and item[1] > 240 and item[2] > 240:
-                new_data.append((255, 255, 255, 0))
-            else:
-                new_data.append(item)
-        
-        img.putdata(new_data)
-        
-        # Save final transparent image
-        final_fp = io.BytesIO()
-        img.save(final_fp, format="PNG")
-        final_fp.seek(0)
-        
-        return send_file(final_fp, mimetype='image/png')
+        png = render_barcode_png(code, module_height)
     except Exception as e:
         return str(e), 500
+    
+    response = current_app.response_class(png, mimetype='image/png')
+    response.set_etag(hashlib.sha1(png).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = BARCODE_MAX_AGE
+    # Answers 304 Not Modified when the browser already has this ETag
+    return response.make_conditional(request)
 
 @products_bp.route('/api/products', methods=['GET'])
 @login_required
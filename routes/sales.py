@@ -1,26 +1,54 @@
 from flask import Blueprint, jsonify, request
 import database
-import database
+import datetime
 from flask import session
 from routes.auth import login_required, login_or_localhost_required, is_localhost
 
 sales_bp = Blueprint('sales', __name__)
 
+SALES_PAGE_DEFAULT = 50
+SALES_PAGE_MAX = 200
+
 @sales_bp.route('/api/sales', methods=['GET'])
 @login_or_localhost_required
 def get_sales():
-    # If Admin: Show all sales
-    if session.get('logged_in'):
-        sales = database.get_all_sales()
-        return jsonify({'sales': sales, 'is_admin': True})
-    
-    # If Localhost (Public): Show only current session sales
-    session_info = database.get_active_session()
-    if session_info:
-        sales = database.get_sales_by_session(session_info['id'])
-        return jsonify({'sales': sales, 'is_admin': False})
-    
-    return jsonify({'sales': [], 'is_admin': False})
+    # Query params:
+    #   limit, before_id, after_id  -> keyset pagination (newest first)
+    #   date_from, date_to          -> YYYY-MM-DD, inclusive
+    #   session_id                  -> admin only
+    #   compact=1                   -> omit items
+    try:
+        limit = min(max(request.args.get('limit', SALES_PAGE_DEFAULT, type=int), 1), SALES_PAGE_MAX)
+        date_from = request.args.get('date_from')
+        date_from = datetime.date.fromisoformat(date_from) if date_from else None
+        date_to = request.args.get('date_to')
+        date_to = datetime.date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    filters = {
+        'limit': limit,
+        'before_id': request.args.get('before_id', type=int),
+        'after_id': request.args.get('after_id', type=int),
+        'date_from': date_from,
+        'date_to': date_to,
+        'include_items': request.args.get('compact') not in ('1', 'true'),
+    }
+
+    # If Admin: Show all sales (optionally filtered by session)
+    is_admin = bool(session.get('logged_in'))
+    if is_admin:
+        filters['session_id'] = request.args.get('session_id', type=int)
+    else:
+        # If Localhost (Public): Show only current session sales
+        session_info = database.get_active_session()
+        if not session_info:
+            return jsonify({'sales': [], 'is_admin': False, 'next_before_id': None})
+        filters['session_id'] = session_info['id']
+
+    sales = database.get_sales_page(**filters)
+    next_before_id = sales[-1]['id'] if len(sales) == limit else None
+    return jsonify({'sales': sales, 'is_admin': is_admin, 'next_before_id': next_before_id})
 
 @sales_bp.route('/api/stats', methods=['GET'])
 @login_or_localhost_required
@@ -30,26 +58,29 @@ def get_stats():
     # 1. Current Session Data (Always visible for localhost/admin)
     session_info = database.get_active_session()
     if session_info:
-        current_sales = database.get_sales_by_session(session_info['id'])
-        session_total = sum(s['total'] for s in current_sales)
+        session_agg = database.get_sales_aggregate('session', session_info['id'])
+        session_total = session_agg['revenue']
         initial_cash = session_info['initial_cash']
         
         stats['current_session'] = {
+            'id': session_info['id'],
             'initial_cash': initial_cash,
             'sales_total': session_total,
             'box_total': initial_cash + session_total,
-            'sale_count': len(current_sales)
+            'sale_count': session_agg['sale_count']
         }
     else:
         stats['current_session'] = None
 
     # 2. Historical Data (Only for Admin)
     if session.get('logged_in'):
-        all_sales = database.get_all_sales()
-        total_revenue = sum(s['total'] for s in all_sales)
+        all_agg = database.get_sales_aggregate('all')
+        today_agg = database.get_sales_aggregate('day', datetime.date.today().isoformat())
         stats['historical'] = {
-            'total_revenue': total_revenue,
-            'total_count': len(all_sales)
+            'total_revenue': all_agg['revenue'],
+            'total_count': all_agg['sale_count'],
+            'today_revenue': today_agg['revenue'],
+            'today_count': today_agg['sale_count']
         }
     
     return jsonify(stats)
@@ -0,0 +1,182 @@
+from flask import Blueprint, request, jsonify, Response
+import json
+import queue
+import threading
+
+status_bp = Blueprint('status', __name__)
+
+HEARTBEAT_TTL = 40        # Seconds a heartbeat keeps a client present (browsers send one every 30 s)
+DISCONNECT_GRACE = 5      # Seconds before a closed stream counts as gone (covers page navigation)
+KEEPALIVE_INTERVAL = 15   # SSE comment sent when idle (also detects dead connections)
+
+# Local clients (the POS app itself) don't count as connections
+LOCAL_IPS = {'127.0.0.1'}
+
+def status_color(count, logged_in_count):
+    # Logic Refined:
+    # Gray: 0 connections
+    # Yellow: Connections exist, but 0 logged in (Lurkers)
+    # Green: Exactly 1 connection, and it is logged in (Clean Admin)
+    # Orange: 1 logged in, but extra connections exist (Suspicious)
+    # Purple: > 1 logged in (Multiple Admins - Danger)
+    if count == 0:
+        return 'gray'
+    elif logged_in_count == 0:
+        return '#FFC107' # Amber/Yellow (Lurkers)
+    elif logged_in_count == 1:
+        if count == 1:
+            return '#28a745' # Green (Clean)
+        else:
+            return '#F59E0B' # Orange (Suspicious - Admin + Lurkers)
+    else:
+        return '#6f42c1' # Purple (Multiple Admins)
+
+class PresenceTracker:
+    """
+    Tracks connected admin clients by IP and pushes status changes to subscribers.
+    A client is present while it has an open event stream, or until its expiry
+    timer fires (heartbeat TTL / disconnect grace). Nothing is scanned per request:
+    the status is recomputed only when a client joins, leaves or changes login.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}  # {ip: {'logged_in': bool, 'streams': int, 'timer': Timer}}
+        self.subscribers = set()
+        self.status = self._compute_status()
+
+    def _compute_status(self):
+        external = {ip: c for ip, c in self.clients.items() if ip not in LOCAL_IPS}
+        count = len(external)
+        logged_in_count = sum(1 for c in external.values() if c['logged_in'])
+        return {
+            'status': 'online',
+            'active_clients': count,
+            'logged_in_clients': logged_in_count,
+            'color': status_color(count, logged_in_count),
+            'clients_detail': {ip: {'logged_in': c['logged_in'], 'streams': c['streams']} for ip, c in external.items()} # Debug info
+        }
+
+    def _publish(self, reason, ip):
+        # Caller holds self.lock
+        status = self._compute_status()
+        if status == self.status:
+            return
+        self.status = status
+        event = dict(status, reason=reason, client=ip)
+        for q in self.subscribers:
+            q.put(event)
+
+    def _set_timer(self, ip, seconds):
+        # Caller holds self.lock
+        client = self.clients[ip]
+        if client['timer']:
+            client['timer'].cancel()
+        client['timer'] = threading.Timer(seconds, self._expire, args=(ip, client))
+        client['timer'].daemon = True
+        client['timer'].start()
+
+    def _expire(self, ip, client):
+        with self.lock:
+            # Ignore timers of a replaced entry or of a client that reconnected
+            if self.clients.get(ip) is client and client['streams'] == 0:
+                del self.clients[ip]
+                self._publish('disconnect', ip)
+
+    def _get_or_add(self, ip, logged_in):
+        client = self.clients.get(ip)
+        if client is None:
+            client = self.clients[ip] = {'logged_in': logged_in, 'streams': 0, 'timer': None}
+            return client, 'connect'
+        reason = 'login' if logged_in and not client['logged_in'] else 'update'
+        client['logged_in'] = logged_in
+        return client, reason
+
+    def heartbeat(self, ip, logged_in):
+        with self.lock:
+            client, reason = self._get_or_add(ip, logged_in)
+            if client['streams'] == 0:
+                self._set_timer(ip, HEARTBEAT_TTL)
+            self._publish(reason, ip)
+
+    def stream_opened(self, ip, logged_in):
+        with self.lock:
+            client, reason = self._get_or_add(ip, logged_in)
+            client['streams'] += 1
+            if client['timer']:
+                client['timer'].cancel()
+                client['timer'] = None
+            self._publish(reason, ip)
+
+    def stream_closed(self, ip):
+        with self.lock:
+            client = self.clients.get(ip)
+            if client is None:
+                return
+            client['streams'] = max(client['streams'] - 1, 0)
+            if client['streams'] == 0:
+                self._set_timer(ip, DISCONNECT_GRACE)
+
+    def subscribe(self):
+        q = queue.Queue()
+        with self.lock:
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
+    def snapshot(self):
+        with self.lock:
+            return self.status
+
+presence = PresenceTracker()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@status_bp.route('/api/heartbeat', methods=['POST'])
+def heartbeat():
+    # Fallback for browsers without EventSource
+    data = request.json or {}
+    presence.heartbeat(request.remote_addr, bool(data.get('logged_in', False)))
+    return jsonify({'success': True})
+
+@status_bp.route('/api/server_status')
+def server_status():
+    return jsonify(presence.snapshot())
+
+@status_bp.route('/api/status/stream')
+def status_stream():
+    """
+    Server-Sent Events channel with 'status' events.
+    ?presence=1&logged_in=0|1 registers the caller as a connected client while
+    the stream is open; without it the caller only watches (POS app).
+    """
+    ip = request.remote_addr
+    track = request.args.get('presence') == '1'
+    logged_in = request.args.get('logged_in') == '1'
+
+    q = presence.subscribe()
+    if track:
+        presence.stream_opened(ip, logged_in)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse('status', dict(presence.snapshot(), reason='snapshot', client=None))
+            while True:
+                try:
+                    event = q.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse('status', event)
+        finally:
+            presence.unsubscribe(q)
+            if track:
+                presence.stream_closed(ip)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
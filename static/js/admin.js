@@ -64,7 +64,7 @@ async function loadStats() {
             addLongPressListener(row, () => showProductDetailsOverlay(productObj));
 
             row.innerHTML = `
-                <img src="${i.image_path ? API_URL + '/uploads/' + i.image_path : '/static/placeholder.png'}" 
+                <img src="${i.image_path ? API_URL + '/uploads/' + i.image_path + '?size=80' : '/static/placeholder.png'}" 
                      style="width:40px; height:40px; object-fit:cover; border-radius:4px; margin-right:10px;"
                      onerror="this.style.display='none'">
                 <div style="flex:1;">
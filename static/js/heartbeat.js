@@ -1,17 +1,17 @@
 import { API_URL } from './modules/common.js';
 
+const isUserLoggedIn = () => document.querySelector('a[href="/session/edit_cash"]') !== null;
+
 /**
  * Sends a heartbeat to the server indicating the user's login status
- * This function should be called periodically to keep the server updated
+ * Fallback for browsers without EventSource support
  */
 export function sendHeartbeat() {
     try {
-        const isUserLoggedIn = document.querySelector('a[href="/session/edit_cash"]') !== null;
-
         fetch(`${API_URL}/heartbeat`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ logged_in: isUserLoggedIn })
+            body: JSON.stringify({ logged_in: isUserLoggedIn() })
         }).catch(() => { }); // Ignore errors
     } catch (e) {
         console.error('Error sending heartbeat:', e);
@@ -19,13 +19,19 @@ export function sendHeartbeat() {
 }
 
 /**
- * Initialize heartbeat system
- * Sends an initial heartbeat and sets up periodic updates
+ * Initialize presence
+ * Keeps a Server-Sent Events stream open: the server counts this client as
+ * connected while the stream is open, so no periodic requests are needed.
+ * Falls back to periodic heartbeats when EventSource is unavailable.
  */
 export function initHeartbeat(intervalMs = 30000) {
-    // Send initial heartbeat
-    sendHeartbeat();
+    if (typeof EventSource === 'undefined') {
+        sendHeartbeat();
+        setInterval(sendHeartbeat, intervalMs);
+        return null;
+    }
 
-    // Set up periodic heartbeat
-    setInterval(sendHeartbeat, intervalMs);
+    const params = new URLSearchParams({ presence: '1', logged_in: isUserLoggedIn() ? '1' : '0' });
+    // EventSource reconnects on its own if the backend restarts
+    return new EventSource(`${API_URL}/status/stream?${params}`);
 }
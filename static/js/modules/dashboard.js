@@ -1,5 +1,43 @@
 import { API_URL, addLongPressListener, showProductDetailsOverlay } from './common.js';
 
+const PAGE_SIZE = 30;
+
+// Local YYYY-MM-DD (sale timestamps are stored in local time)
+const toDateStr = (date) => date.toLocaleDateString('en-CA');
+const getLocalDateStr = (ts) => {
+    // Handle both "YYYY-MM-DD HH:MM:SS" and "YYYY-MM-DDTHH:MM:SS"
+    return ts.split(/[ T]/)[0];
+};
+
+// One pager per list. newestId is used to poll for new sales (after_id),
+// nextBeforeId to fetch the next older page (before_id) on scroll.
+function createPager(listId, baseParams) {
+    return {
+        listId,
+        baseParams,
+        newestId: null,
+        nextBeforeId: null,
+        loading: false,
+        started: false,
+        day: null,        // Day the list was built for (session list resets at midnight)
+        topDate: null,    // Historical list: newest date header rendered
+        oldestDate: null, // Historical list: oldest date header rendered
+        topEmpty: false,  // Historical list: newest date header has no sales yet
+        sentinel: null,
+        observer: null,
+    };
+}
+
+const sessionPager = createPager('session-sales-list', {});
+const historicalPager = createPager('historical-sales-list', {});
+
+async function fetchSales(params) {
+    const query = new URLSearchParams({ limit: PAGE_SIZE, ...params });
+    const res = await fetch(`${API_URL}/sales?${query}`);
+    if (res.status === 401) { window.location.href = '/login'; return null; }
+    return res.json();
+}
+
 export async function loadStats() {
     try {
         // 1. Load Stats (Totals)
@@ -27,124 +65,14 @@ export async function loadStats() {
             histSection.style.display = 'none';
         }
 
-        // 2. Load Sales List
-        const resSales = await fetch(`${API_URL}/sales`);
-        const data = await resSales.json();
-        const sales = data.sales;
-        const isAdmin = data.is_admin;
-
-        const sessionList = document.getElementById('session-sales-list');
-        const historicalList = document.getElementById('historical-sales-list');
-
-        // --- Session List (Today's Sales) ---
-        const now = new Date();
-        // Robust YYYY-MM-DD generation for local time
-        const year = now.getFullYear();
-        const month = String(now.getMonth() + 1).padStart(2, '0');
-        const day = String(now.getDate()).padStart(2, '0');
-        const todayStr = `${year}-${month}-${day}`;
-
-        const getLocalDateStr = (ts) => {
-            // Handle both "YYYY-MM-DD HH:MM:SS" and "YYYY-MM-DDTHH:MM:SS"
-            return ts.split(/[ T]/)[0];
-        };
-
-        const todaySales = sales.filter(s => getLocalDateStr(s.timestamp) === todayStr);
-
-        sessionList.innerHTML = "";
-        if (todaySales.length > 0) {
-            const totalToday = todaySales.length;
-            todaySales.forEach((s, index) => {
-                const dailyNum = totalToday - index;
-                renderSaleItem(s, sessionList, dailyNum);
-            });
-        } else {
-            sessionList.innerHTML = '<li class="empty-msg">No hay ventas hoy.</li>';
-        }
+        // 2. Load Sales Lists (first page once, then only newer sales)
+        const todayStr = toDateStr(new Date());
+        sessionPager.baseParams = { date_from: todayStr, date_to: todayStr };
+        await refreshPager(sessionPager, todayStr);
 
         // --- Historical List (Admin Only) ---
-        if (isAdmin) {
-            historicalList.innerHTML = "";
-
-            // 1. Group sales by date
-            const salesByDate = {};
-            sales.forEach(s => {
-                const date = getLocalDateStr(s.timestamp);
-                if (!salesByDate[date]) salesByDate[date] = [];
-                salesByDate[date].push(s);
-            });
-
-            // 2. Generate all dates from first sale to today
-            let allDates = Object.keys(salesByDate).sort().reverse(); // Newest first
-            if (allDates.length > 0) {
-                const firstDate = new Date(allDates[allDates.length - 1]);
-                const lastDate = new Date(todayStr); // Up to today
-
-                // Fill gaps
-                const dateArray = [];
-                let curr = new Date(lastDate);
-                while (curr >= firstDate) {
-                    dateArray.push(curr.toLocaleDateString('en-CA'));
-                    curr.setDate(curr.getDate() - 1);
-                }
-                allDates = dateArray;
-            } else {
-                allDates = [todayStr];
-            }
-
-            // 3. Render
-            allDates.forEach(dateStr => {
-                // Header
-                const dateObj = new Date(dateStr + "T00:00:00"); // Force local time
-                const options = { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' };
-                let label = dateObj.toLocaleDateString('es-ES', options);
-                label = label.charAt(0).toUpperCase() + label.slice(1);
-
-                const yesterday = new Date(now); yesterday.setDate(now.getDate() - 1);
-                const yStr = yesterday.toLocaleDateString('en-CA');
-                const antier = new Date(now); antier.setDate(now.getDate() - 2);
-                const aStr = antier.toLocaleDateString('en-CA');
-
-                if (dateStr === todayStr) label = "Hoy";
-                else if (dateStr === yStr) label = "Ayer";
-                else if (dateStr === aStr) label = "Antier";
-                else {
-                    const day = dateObj.getDate();
-                    const month = dateObj.toLocaleDateString('es-ES', { month: 'long' });
-                    const year = dateObj.getFullYear();
-                    label = `${day} de ${month} del ${year}`;
-                }
-
-                const header = document.createElement('li');
-                header.className = "date-header";
-                header.style.padding = "10px";
-                header.style.backgroundColor = "#e5e7eb";
-                header.style.fontWeight = "bold";
-                header.style.color = "#374151";
-                header.style.marginTop = "15px";
-                header.style.borderRadius = "4px";
-                header.style.display = "flex";
-                header.style.justifyContent = "space-between";
-                header.innerHTML = `<span>${label}</span>`;
-                historicalList.appendChild(header);
-
-                const daySales = salesByDate[dateStr] || [];
-
-                if (daySales.length > 0) {
-                    const totalDay = daySales.length;
-                    daySales.forEach((s, index) => {
-                        const dailyNum = totalDay - index;
-                        renderSaleItem(s, historicalList, dailyNum);
-                    });
-                } else {
-                    const emptyMsg = document.createElement('li');
-                    emptyMsg.style.padding = "10px";
-                    emptyMsg.style.color = "#D9534F"; // Red
-                    emptyMsg.style.fontStyle = "italic";
-                    emptyMsg.textContent = "No se registraron ventas este día";
-                    historicalList.appendChild(emptyMsg);
-                }
-            });
+        if (stats.historical) {
+            await refreshPager(historicalPager, todayStr);
         }
 
     } catch (e) {
@@ -152,7 +80,219 @@ export async function loadStats() {
     }
 }
 
-function renderSaleItem(s, listElement, dailyNum) {
+async function refreshPager(pager, todayStr) {
+    if (pager.loading) return;
+
+    if (!pager.started || pager.day !== todayStr) {
+        await resetPager(pager, todayStr);
+        return;
+    }
+
+    if (pager.newestId === null) {
+        // List was empty: reload the first page
+        await resetPager(pager, todayStr);
+        return;
+    }
+
+    pager.loading = true;
+    try {
+        const data = await fetchSales({ ...pager.baseParams, after_id: pager.newestId });
+        if (!data || data.sales.length === 0) return;
+
+        const isHistorical = pager === historicalPager;
+        const needsReset = data.next_before_id !== null || (isHistorical && (
+            pager.topEmpty || data.sales.some(s => getLocalDateStr(s.timestamp) !== pager.topDate)
+        ));
+        if (needsReset) {
+            pager.loading = false;
+            await resetPager(pager, todayStr);
+            return;
+        }
+
+        prependSales(pager, data.sales);
+        pager.newestId = data.sales[0].id;
+    } finally {
+        pager.loading = false;
+    }
+}
+
+async function resetPager(pager, todayStr) {
+    pager.loading = true;
+    try {
+        const data = await fetchSales(pager.baseParams);
+        if (!data) return;
+
+        const list = document.getElementById(pager.listId);
+        list.innerHTML = "";
+        pager.started = true;
+        pager.day = todayStr;
+        pager.topDate = null;
+        pager.oldestDate = null;
+        pager.topEmpty = false;
+        pager.newestId = data.sales.length > 0 ? data.sales[0].id : null;
+
+        if (pager === historicalPager) {
+            appendHistoricalSales(pager, data.sales, todayStr);
+        } else if (data.sales.length > 0) {
+            data.sales.forEach(s => list.appendChild(createSaleItem(s, s.daily_number)));
+        } else {
+            list.innerHTML = '<li class="empty-msg">No hay ventas hoy.</li>';
+        }
+
+        setNextPage(pager, data.next_before_id);
+    } finally {
+        pager.loading = false;
+    }
+}
+
+async function loadNextPage(pager) {
+    if (pager.loading || pager.nextBeforeId === null) return;
+    pager.loading = true;
+    try {
+        const data = await fetchSales({ ...pager.baseParams, before_id: pager.nextBeforeId });
+        if (!data) return;
+
+        const list = document.getElementById(pager.listId);
+        if (pager === historicalPager) {
+            appendHistoricalSales(pager, data.sales, pager.day);
+        } else {
+            data.sales.forEach(s => list.insertBefore(createSaleItem(s, s.daily_number), pager.sentinel));
+        }
+        setNextPage(pager, data.next_before_id);
+    } finally {
+        pager.loading = false;
+    }
+}
+
+// Infinite scroll: a sentinel at the end of the list loads the next page when visible
+function setNextPage(pager, nextBeforeId) {
+    pager.nextBeforeId = nextBeforeId;
+    const list = document.getElementById(pager.listId);
+
+    if (!pager.sentinel) {
+        pager.sentinel = document.createElement('li');
+        pager.sentinel.className = "list-sentinel";
+        pager.observer = new IntersectionObserver(entries => {
+            if (entries.some(e => e.isIntersecting)) loadNextPage(pager);
+        }, { rootMargin: '400px' });
+    }
+
+    if (nextBeforeId !== null) {
+        list.appendChild(pager.sentinel); // Keep it last
+        // Re-observe so a sentinel that is still visible triggers the next page
+        pager.observer.unobserve(pager.sentinel);
+        pager.observer.observe(pager.sentinel);
+    } else if (pager.sentinel.parentNode) {
+        pager.sentinel.remove();
+    }
+}
+
+function prependSales(pager, sales) {
+    const list = document.getElementById(pager.listId);
+
+    if (pager === historicalPager) {
+        // All new sales belong to the top date (checked by the caller): insert below its header
+        const header = list.querySelector('.date-header');
+        [...sales].reverse().forEach(s => header.after(createSaleItem(s, s.daily_number)));
+        return;
+    }
+
+    const empty = list.querySelector('.empty-msg');
+    if (empty) empty.remove();
+    [...sales].reverse().forEach(s => list.prepend(createSaleItem(s, s.daily_number)));
+}
+
+// Appends a page to the historical list, adding date headers (and gap days
+// without sales) as the dates change. Pages arrive newest first.
+function appendHistoricalSales(pager, sales, todayStr) {
+    const list = document.getElementById(pager.listId);
+    const insert = (el) => {
+        if (pager.sentinel && pager.sentinel.parentNode === list) list.insertBefore(el, pager.sentinel);
+        else list.appendChild(el);
+    };
+
+    const addDay = (dateStr, hasSales) => {
+        insert(createDateHeader(dateStr, todayStr));
+        if (!hasSales) insert(createEmptyDayMessage());
+        if (pager.topDate === null) {
+            pager.topDate = dateStr;
+            pager.topEmpty = !hasSales;
+        }
+        pager.oldestDate = dateStr;
+    };
+
+    // Days between the previous oldest header (exclusive) and `dateStr` (exclusive)
+    const fillGap = (dateStr) => {
+        const start = pager.oldestDate === null ? null : new Date(pager.oldestDate + "T00:00:00");
+        let curr = start ? new Date(start) : new Date(todayStr + "T00:00:00");
+        if (start) curr.setDate(curr.getDate() - 1);
+        while (toDateStr(curr) > dateStr) {
+            addDay(toDateStr(curr), false);
+            curr.setDate(curr.getDate() - 1);
+        }
+    };
+
+    if (sales.length === 0 && pager.oldestDate === null) {
+        addDay(todayStr, false);
+        return;
+    }
+
+    sales.forEach(s => {
+        const dateStr = getLocalDateStr(s.timestamp);
+        if (dateStr !== pager.oldestDate) {
+            fillGap(dateStr);
+            addDay(dateStr, true);
+        }
+        insert(createSaleItem(s, s.daily_number));
+    });
+}
+
+function createDateHeader(dateStr, todayStr) {
+    const now = new Date(todayStr + "T00:00:00");
+    const dateObj = new Date(dateStr + "T00:00:00"); // Force local time
+    const options = { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' };
+    let label = dateObj.toLocaleDateString('es-ES', options);
+    label = label.charAt(0).toUpperCase() + label.slice(1);
+
+    const yesterday = new Date(now); yesterday.setDate(now.getDate() - 1);
+    const yStr = yesterday.toLocaleDateString('en-CA');
+    const antier = new Date(now); antier.setDate(now.getDate() - 2);
+    const aStr = antier.toLocaleDateString('en-CA');
+
+    if (dateStr === todayStr) label = "Hoy";
+    else if (dateStr === yStr) label = "Ayer";
+    else if (dateStr === aStr) label = "Antier";
+    else {
+        const day = dateObj.getDate();
+        const month = dateObj.toLocaleDateString('es-ES', { month: 'long' });
+        const year = dateObj.getFullYear();
+        label = `${day} de ${month} del ${year}`;
+    }
+
+    const header = document.createElement('li');
+    header.className = "date-header";
+    header.style.padding = "10px";
+    header.style.backgroundColor = "#e5e7eb";
+    header.style.fontWeight = "bold";
+    header.style.color = "#374151";
+    header.style.marginTop = "15px";
+    header.style.borderRadius = "4px";
+    header.style.display = "flex";
+    header.style.justifyContent = "space-between";
+    header.innerHTML = `<span>${label}</span>`;
+    return header;
+}
+
+function createEmptyDayMessage() {
+    const emptyMsg = document.createElement('li');
+    emptyMsg.style.padding = "10px";
+    emptyMsg.style.color = "#D9534F"; // Red
+    emptyMsg.style.fontStyle = "italic";
+    emptyMsg.textContent = "No se registraron ventas este día";
+    return emptyMsg;
+}
+
+function createSaleItem(s, dailyNum) {
     const li = document.createElement('li');
     li.className = "item-container";
 
@@ -195,7 +335,7 @@ function renderSaleItem(s, listElement, dailyNum) {
             addLongPressListener(row, () => showProductDetailsOverlay(productObj));
 
             row.innerHTML = `
-                <img src="${i.image_path ? API_URL + '/uploads/' + i.image_path : '/static/placeholder.png'}" 
+                <img src="${i.image_path ? API_URL + '/uploads/' + i.image_path + '?size=80' : '/static/placeholder.png'}" 
                      style="width:40px; height:40px; object-fit:cover; border-radius:4px; margin-right:10px;"
                      onerror="this.style.display='none'">
                 <div style="flex:1;">
@@ -211,5 +351,5 @@ function renderSaleItem(s, listElement, dailyNum) {
     }
 
     li.appendChild(details);
-    listElement.appendChild(li);
+    return li;
 }
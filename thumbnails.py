@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, features
+
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_QUALITY = 80
+
+# Variants generated for uploaded product images (square bounding box, in px)
+UPLOAD_FOLDER = 'static/uploads'
+UPLOAD_THUMB_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbs')
+UPLOAD_THUMB_SIZES = (80, 256)
+UPLOAD_THUMB_FORMATS = ('webp', 'jpg') if features.check('webp') else ('jpg',)
+
+# Images imported from the inventory PDF, with a 256 px JPEG per product
+PRODUCT_IMAGE_FOLDER = os.path.join('static', 'images', 'products')
+PRODUCT_THUMB_FOLDER = os.path.join(PRODUCT_IMAGE_FOLDER, 'thumbs')
+
+_FORMAT_NAMES = {'jpg': 'JPEG', 'webp': 'WEBP'}
+
+# Single worker: uploads are rare and this keeps request threads free
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+
+def load_scaled(source, size, modes=('RGB', 'L'), fallback_mode='RGB'):
+    """
+    Opens `source` (path or file object) and returns it upright and scaled to
+    fit `size`, converted to fallback_mode unless already in one of `modes`.
+    """
+    with Image.open(source) as img:
+        # JPEG: let the decoder downscale (much faster for multi-megapixel photos)
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        if img.mode not in modes:
+            img = img.convert(fallback_mode)
+        img.load()
+    return img
+
+def _save_atomic(img, dest_path, fmt, quality):
+    # Own temp file per writer: the background worker and a ?size= request may
+    # render the same variant at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if fmt == 'JPEG':
+                img.save(f, fmt, quality=quality, optimize=True)
+            else:
+                img.save(f, fmt, quality=quality, method=4)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def create_thumbnail(source, dest_path, size=THUMBNAIL_SIZE, quality=THUMBNAIL_QUALITY):
+    """
+    Writes a downscaled JPEG of `source` (path or file object) to dest_path.
+    The file is written to a temp name and renamed, so readers never see a partial image.
+    """
+    _save_atomic(load_scaled(source, size), dest_path, 'JPEG', quality)
+    return dest_path
+
+def upload_thumbnail_path(filename, size, ext):
+    """Path of the `size` px variant of an uploaded image, e.g. thumbs/80/<name>.webp"""
+    base = os.path.splitext(filename)[0]
+    return os.path.join(UPLOAD_THUMB_FOLDER, str(size), f"{base}.{ext}")
+
+def create_upload_thumbnails(filename, force=False):
+    """
+    Generates every size/format variant of static/uploads/<filename>.
+    Existing variants newer than the original are kept unless force is set.
+    Returns the number of files written.
+    """
+    source = os.path.join(UPLOAD_FOLDER, filename)
+    source_mtime = os.stat(source).st_mtime
+    written = 0
+    for size in UPLOAD_THUMB_SIZES:
+        img = None
+        for ext in UPLOAD_THUMB_FORMATS:
+            dest = upload_thumbnail_path(filename, size, ext)
+            if not force and os.path.exists(dest) and os.stat(dest).st_mtime >= source_mtime:
+                continue
+            if img is None:
+                img = load_scaled(source, (size, size))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            _save_atomic(img, dest, _FORMAT_NAMES[ext], THUMBNAIL_QUALITY)
+            written += 1
+    return written
+
+def preview_path(image_path):
+    """
+    Up-to-date 256 px JPEG of an imported or uploaded product image, so the POS
+    preview doesn't decode the full-size original. None if there is none yet.
+    """
+    folder, filename = os.path.split(os.path.normpath(image_path))
+    if folder == os.path.normpath(PRODUCT_IMAGE_FOLDER):
+        candidate = os.path.join(PRODUCT_THUMB_FOLDER, f"{os.path.splitext(filename)[0]}.jpg")
+    elif folder == os.path.normpath(UPLOAD_FOLDER):
+        candidate = upload_thumbnail_path(filename, max(UPLOAD_THUMB_SIZES), 'jpg')
+    else:
+        return None
+    try:
+        if os.stat(candidate).st_mtime >= os.stat(image_path).st_mtime:
+            return candidate
+    except OSError:
+        pass
+    return None
+
+def _create_upload_thumbnails_logged(filename):
+    try:
+        create_upload_thumbnails(filename)
+    except Exception as e:
+        print(f"Error creating thumbnails for {filename}: {e}")
+
+def queue_upload_thumbnails(filename):
+    """Generates the variants of a fresh upload in the background."""
+    return _executor.submit(_create_upload_thumbnails_logged, filename)
+
+def backfill_upload_thumbnails(force=False):
+    """Creates missing variants for every file already in static/uploads."""
+    if not os.path.isdir(UPLOAD_FOLDER):
+        return 0
+    total = 0
+    for filename in sorted(os.listdir(UPLOAD_FOLDER)):
+        if not os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+            continue
+        try:
+            written = create_upload_thumbnails(filename, force=force)
+        except Exception as e:
+            print(f"Error creating thumbnails for {filename}: {e}")
+            continue
+        if written:
+            print(f"{filename}: {written} miniaturas")
+        total += written
+    return total
+
+if __name__ == "__main__":
+    # python thumbnails.py [--force]  -> backfill of existing uploads
+    count = backfill_upload_thumbnails(force="--force" in sys.argv[1:])
+    print(f"Miniaturas generadas: {count}")
@@ -0,0 +1,75 @@
+from thumbnails import load_scaled
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import os
+
+class ImageCache:
+    """
+    LRU cache of pre-scaled product thumbnails, bounded by decoded size in bytes.
+    Decoding happens on a worker thread so large photos never block the Tk loop.
+    Entries are keyed by path and invalidated when the file's mtime changes.
+    """
+
+    def __init__(self, size=(110, 110), max_bytes=16 * 1024 * 1024, workers=2):
+        self.size = size
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # path -> (mtime_ns, PIL image, nbytes)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-cache")
+
+    def get(self, path):
+        """Returns the cached thumbnail for path, or None if missing/stale."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry[0] != mtime:
+                return None
+            self.entries.move_to_end(path)
+            return entry[1]
+
+    def load_async(self, path, callback):
+        """
+        Decodes path in the background and calls callback(image) from the worker
+        thread (image is None on failure). The callback must hand off to the Tk loop.
+        """
+        with self.lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+        self.executor.submit(self._load, path, callback)
+
+    def _load(self, path, callback):
+        image = None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            image = self._decode(path)
+            self._store(path, mtime, image)
+        except Exception as e:
+            print(f"Error loading image {path}: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(path)
+        callback(image)
+
+    def _decode(self, path):
+        # Transparency is kept for the Tk label
+        return load_scaled(path, self.size, modes=('RGB', 'RGBA'), fallback_mode='RGBA')
+
+    def _store(self, path, mtime, image):
+        nbytes = image.width * image.height * len(image.getbands())
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old:
+                self.total_bytes -= old[2]
+            self.entries[path] = (mtime, image, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, _, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
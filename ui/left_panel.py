@@ -3,9 +3,72 @@ from tkinter import ttk
 import customtkinter as ctk
 from ui.styles import *
 from ui.icon_manager import IconManager
+from ui.image_cache import ImageCache
+from thumbnails import preview_path
 from PIL import Image
 import os
 
+# Cart rows are recycled: only the rows that fit in the canvas viewport exist
+CART_ROW_HEIGHT = 40
+CART_ROW_PADX = 10
+CART_ROW_PADY = 2
+CART_ROW_STRIDE = CART_ROW_HEIGHT + 2 * CART_ROW_PADY + 1 # + 1px separator
+
+class CartRow:
+    """One cart line drawn in the canvas. Labels are reconfigured only when values change."""
+
+    def __init__(self, canvas):
+        # Using tk.Label for layout perf
+        self.frame = tk.Frame(canvas, bg=COLOR_SURFACE, height=CART_ROW_HEIGHT + 1)
+        self.frame.pack_propagate(False)
+        self.values = None
+
+        # Separator
+        tk.Frame(self.frame, height=1, bg=COLOR_BACKGROUND).pack(side="bottom", fill="x")
+
+        # Col 0: Name (Left, expandable)
+        self.lbl_name = tk.Label(self.frame, font=FONT_BODY_BOLD, fg=COLOR_TEXT, bg=COLOR_SURFACE, anchor="w")
+        self.lbl_name.pack(side="left", fill="x", expand=True)
+
+        # Col 2: Total Price (Right, Bold)
+        price_frame = tk.Frame(self.frame, bg=COLOR_SURFACE)
+        price_frame.pack(side="right", padx=(10, 0))
+
+        # Column widths (CLAVE)
+        price_frame.grid_columnconfigure(0, minsize=12)   # $
+        price_frame.grid_columnconfigure(1, minsize=84)   # número completo
+
+        tk.Label(price_frame, text="$", font=FONT_BODY_BOLD, fg=COLOR_TEXT, bg=COLOR_SURFACE,
+                 anchor="e").grid(row=0, column=0, sticky="e")
+        self.lbl_total = tk.Label(price_frame, font=FONT_BODY_BOLD, fg=COLOR_TEXT, bg=COLOR_SURFACE, anchor="e")
+        self.lbl_total.grid(row=0, column=1, sticky="e")
+
+        # Col 1: Qty x Unit Price (Right) with 2-column price alignment
+        qty_frame = tk.Frame(self.frame, bg=COLOR_SURFACE)
+        qty_frame.pack(side="right", padx=(80, 40))
+
+        qty_frame.grid_columnconfigure(1, minsize=12)  # $
+        qty_frame.grid_columnconfigure(2, minsize=64)  # número completo
+
+        self.lbl_qty = tk.Label(qty_frame, font=FONT_SMALL, fg=COLOR_TEXT_LIGHT, bg=COLOR_SURFACE, anchor="e")
+        self.lbl_qty.grid(row=0, column=0, sticky="e")
+        tk.Label(qty_frame, text="$", font=FONT_SMALL, fg=COLOR_TEXT_LIGHT, bg=COLOR_SURFACE,
+                 anchor="e").grid(row=0, column=1, sticky="e")
+        self.lbl_price = tk.Label(qty_frame, font=FONT_SMALL, fg=COLOR_TEXT_LIGHT, bg=COLOR_SURFACE, anchor="e")
+        self.lbl_price.grid(row=0, column=2, sticky="e")
+
+    def show(self, item):
+        values = (item['name'], item['quantity'], item['price'], item['total'])
+        if values == self.values:
+            return
+        name, quantity, price, total = values
+        if self.values is None or name != self.values[0]:
+            self.lbl_name.configure(text=name)
+        self.lbl_qty.configure(text=f"{quantity} x")
+        self.lbl_price.configure(text=f"{price:.2f}")
+        self.lbl_total.configure(text=f"{total:.2f}")
+        self.values = values
+
 class LeftPanel(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent, bg=COLOR_BACKGROUND) 
@@ -85,34 +148,18 @@ class LeftPanel(tk.Frame):
 
         self.cart_canvas = tk.Canvas(self.cart_canvas_container, bg=COLOR_SURFACE, highlightthickness=0)
         self.cart_scrollbar = ttk.Scrollbar(self.cart_canvas_container, orient="vertical", command=self.cart_canvas.yview)
-        self.cart_canvas.configure(yscrollcommand=self.cart_scrollbar.set)
+        # Every scroll movement goes through here: re-bind the recycled rows to the new viewport
+        self.cart_canvas.configure(yscrollcommand=self.on_cart_scroll)
 
         self.cart_canvas.grid(row=0, column=0, sticky="nsew")
         self.cart_scrollbar.grid(row=0, column=1, sticky="ns")
 
-        self.cart_frame = tk.Frame(self.cart_canvas, bg=COLOR_SURFACE)
-        self.cart_window_id = self.cart_canvas.create_window((0, 0), window=self.cart_frame, anchor="nw")
-
-        def _configure_inner_frame(event):
-            # Update scrollregion
-            self.cart_canvas.configure(scrollregion=self.cart_canvas.bbox("all"))
-            
-            # Auto-hide/show scrollbar logic
-            content_height = self.cart_frame.winfo_reqheight()
-            visible_height = self.cart_canvas.winfo_height()
-            
-            if content_height > visible_height:
-                self.cart_scrollbar.grid(row=0, column=1, sticky="ns")
-            else:
-                self.cart_scrollbar.grid_remove()
-
-        def _configure_canvas(event):
-            self.cart_canvas.itemconfig(self.cart_window_id, width=event.width)
-            # Re-check scrollbar on canvas resize (e.g. max/restore window)
-            _configure_inner_frame(None)
+        # Virtualized list state
+        self.cart_items = []
+        self.cart_rows = []     # Pool of CartRow, sized to the viewport
+        self.cart_windows = []  # Canvas window id for each pooled row
 
-        self.cart_frame.bind("<Configure>", _configure_inner_frame)
-        self.cart_canvas.bind("<Configure>", _configure_canvas)
+        self.cart_canvas.bind("<Configure>", self.on_cart_canvas_configure)
         
         # --- Image Preview (Small, Bottom Left) ---
         self.image_frame = ctk.CTkFrame(self.content_frame, fg_color=COLOR_SURFACE, height=0, # Start hidden
@@ -121,6 +168,10 @@ class LeftPanel(tk.Frame):
         self.image_frame.pack_propagate(False)
         self.lbl_image = ctk.CTkLabel(self.image_frame, text="", text_color=COLOR_TEXT_LIGHT)
         self.lbl_image.pack(expand=True, fill="both")
+        
+        # Decoded thumbnails (LRU, decoded off the Tk thread)
+        self.image_cache = ImageCache(size=(110, 110))
+        self.current_image_path = None
 
         # Initial State
         self.show_empty_state()
@@ -156,111 +207,109 @@ class LeftPanel(tk.Frame):
         self.controller.process_barcode(barcode)
 
     def update_cart_display(self, cart):
-        if not cart:
+        previous_count = len(self.cart_items)
+        self.cart_items = list(cart)
+
+        if not self.cart_items:
             self.show_empty_state()
             return
         
         self.show_cart_list()
-        
-        for widget in self.cart_frame.winfo_children():
-            widget.destroy()
-        
-        # We don't need header row inside canvas anymore, it's fixed above
-        self.cart_frame.grid_columnconfigure(1, weight=1)
-
-        for i, item in enumerate(cart):
-            # Using tk.Label for layout perf
-            
-            # Row Container
-            h = 40
-            row_frame = tk.Frame(self.cart_frame, bg=COLOR_SURFACE, height=h)
-            row_frame.pack(fill="x", padx=10, pady=2)
-            row_frame.pack_propagate(False)
-            row_frame.grid_columnconfigure(1, weight=1)
-            
-            # Name
-            tk.Label(row_frame, text=item['name'], font=FONT_BODY, fg=COLOR_TEXT, bg=COLOR_SURFACE, anchor="w").grid(row=0, column=1, sticky="ew", padx=5)
-            
-            # Qty (Left aligned or pill?)
-            # Let's put Qty first? Design says separate columns.
-            # Re-aligning with header: Product (0), Qty (1), Price (2)
-            # The header above: Product (Left), Cant (Right), Price (Right -- Wait, Total?)
-            
-            # Let's match: 
-            # Col 0: Name (Expanded)
-            # Col 1: Qty x Unit Price (Right)
-            # Col 2: Total Price (Right, Bold)
-            
-            # Name (Left, expandable)
-            tk.Label(row_frame, text=item['name'], font=FONT_BODY_BOLD, fg=COLOR_TEXT, bg=COLOR_SURFACE, anchor="w").pack(side="left", fill="x", expand=True)
-            
-            price_frame = tk.Frame(row_frame, bg=COLOR_SURFACE)
-            price_frame.pack(side="right", padx=(10, 0))
-
-            # Column widths (CLAVE)
-            price_frame.grid_columnconfigure(0, minsize=12)   # $
-            price_frame.grid_columnconfigure(1, minsize=84)   # número completo
-
-            tk.Label(
-                price_frame, text="$",
-                font=FONT_BODY_BOLD,
-                fg=COLOR_TEXT, bg=COLOR_SURFACE,
-                anchor="e"
-            ).grid(row=0, column=0, sticky="e")
-
-            tk.Label(
-                price_frame, text=f"{item['price']:.2f}",
-                font=FONT_BODY_BOLD,
-                fg=COLOR_TEXT, bg=COLOR_SURFACE,
-                anchor="e"
-            ).grid(row=0, column=1, sticky="e")
-
-
-            # Qty box with 2-column price alignment
-            qty_frame = tk.Frame(row_frame, bg=COLOR_SURFACE)
-            qty_frame.pack(side="right", padx=(80, 40))
-
-            
-            qty_frame.grid_columnconfigure(1, minsize=12)  # $
-            qty_frame.grid_columnconfigure(2, minsize=64)  # número completo
-
-            tk.Label(
-                qty_frame, text="$",
-                font=FONT_SMALL,
-                fg=COLOR_TEXT_LIGHT, bg=COLOR_SURFACE,
-                anchor="e"
-            ).grid(row=0, column=1, sticky="e")
-
-            tk.Label(
-                qty_frame, text=f"{item['price']:.2f}",
-                font=FONT_SMALL,
-                fg=COLOR_TEXT_LIGHT, bg=COLOR_SURFACE,
-                anchor="e"
-            ).grid(row=0, column=2, sticky="e")
-
-            # Separator
-            tk.Frame(self.cart_frame, height=1, bg=COLOR_BACKGROUND).pack(fill="x", padx=10)
+        self.update_cart_scrollregion()
+
+        if len(self.cart_items) > previous_count:
+            # New item appended: bring it into view
+            self.cart_canvas.yview_moveto(1.0)
+        self.render_cart_rows()
+
+    def update_cart_scrollregion(self):
+        content_height = len(self.cart_items) * CART_ROW_STRIDE
+        self.cart_canvas.configure(scrollregion=(0, 0, self.cart_canvas.winfo_width(), content_height))
+
+        # Auto-hide/show scrollbar logic
+        if content_height > self.cart_canvas.winfo_height():
+            self.cart_scrollbar.grid(row=0, column=1, sticky="ns")
+        else:
+            self.cart_scrollbar.grid_remove()
+
+    def render_cart_rows(self):
+        """Binds the pooled rows to the cart items currently inside the viewport."""
+        count = len(self.cart_items)
+        visible_slots = min(self.cart_canvas.winfo_height() // CART_ROW_STRIDE + 2, count)
+        row_width = max(self.cart_canvas.winfo_width() - 2 * CART_ROW_PADX, 1)
+
+        while len(self.cart_rows) < visible_slots:
+            row = CartRow(self.cart_canvas)
+            window_id = self.cart_canvas.create_window(CART_ROW_PADX, 0, window=row.frame, anchor="nw", width=row_width)
+            self.cart_rows.append(row)
+            self.cart_windows.append(window_id)
+
+        first = max(int(self.cart_canvas.canvasy(0) // CART_ROW_STRIDE), 0)
+        for slot, (row, window_id) in enumerate(zip(self.cart_rows, self.cart_windows)):
+            index = first + slot
+            if index < count:
+                row.show(self.cart_items[index])
+                self.cart_canvas.coords(window_id, CART_ROW_PADX, index * CART_ROW_STRIDE + CART_ROW_PADY)
+                self.cart_canvas.itemconfigure(window_id, state="normal")
+            else:
+                self.cart_canvas.itemconfigure(window_id, state="hidden")
+
+    def on_cart_scroll(self, first, last):
+        self.cart_scrollbar.set(first, last)
+        if self.cart_items:
+            self.render_cart_rows()
+
+    def on_cart_canvas_configure(self, event):
+        row_width = max(event.width - 2 * CART_ROW_PADX, 1)
+        for window_id in self.cart_windows:
+            self.cart_canvas.itemconfigure(window_id, width=row_width)
+        # Re-check scrollbar and pool size on canvas resize (e.g. max/restore window)
+        if self.cart_items:
+            self.update_cart_scrollregion()
+            self.render_cart_rows()
 
     def set_last_item(self, text, color):
         if color == "gray": color = STATUS_IDLE
         self.lbl_last_item.configure(text=text, text_color=color)
 
+    def resolve_image_path(self, image_path):
+        # Uploaded images are stored by filename (static/uploads), imported ones
+        # relative to static/ ("images/products/...")
+        for full_path in (os.path.join("static", image_path), os.path.join("static", "uploads", image_path)):
+            if os.path.isfile(full_path):
+                # Prefer the pre-scaled thumbnail written at import/upload time
+                return preview_path(full_path) or full_path
+        return None
+
     def update_product_image(self, image_path):
-        if image_path:
-            try:
-                full_path = os.path.join("static", "uploads", image_path)
-                if os.path.exists(full_path):
-                    self.image_frame.configure(height=120, border_width=1, border_color=COLOR_BORDER)
-                    pil_img = Image.open(full_path)
-                    pil_img.thumbnail((110, 110))
-                    ctk_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
-                    self.lbl_image.configure(image=ctk_img, text="")
-                else:
-                    self.hide_image()
-            except Exception:
-                self.hide_image()
-        else:
+        self.current_image_path = image_path
+        full_path = self.resolve_image_path(image_path) if image_path else None
+        if not full_path:
             self.hide_image()
+            return
+
+        pil_img = self.image_cache.get(full_path)
+        if pil_img is not None:
+            self.show_image(pil_img)
+            return
+
+        # Not cached yet: decode in the background, scanning continues meanwhile
+        self.hide_image()
+
+        def on_loaded(img):
+            self.after(0, lambda: self.on_image_loaded(image_path, img))
+
+        self.image_cache.load_async(full_path, on_loaded)
+
+    def on_image_loaded(self, image_path, pil_img):
+        # Ignore results for a product that is no longer displayed
+        if pil_img is not None and image_path == self.current_image_path:
+            self.show_image(pil_img)
+
+    def show_image(self, pil_img):
+        self.image_frame.configure(height=120, border_width=1, border_color=COLOR_BORDER)
+        ctk_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
+        self.lbl_image.configure(image=ctk_img, text="")
 
     def hide_image(self):
         self.image_frame.configure(height=0, border_width=0)
@@ -2,6 +2,9 @@ import customtkinter as ctk
 import requests
 import socket
 import datetime
+import json
+import threading
+import time
 from ui.styles import *
 from ui.icon_manager import IconManager
 
@@ -109,12 +112,15 @@ class RightPanel(ctk.CTkFrame):
         self.btn_import = create_nav_tile(self.bottom_tools, "Importar Inventario", self.icon_import, self.controller.import_inventory)
         self.btn_import.pack(fill="x", pady=(0, 8))
 
+        self.btn_printer = create_nav_tile(self.bottom_tools, "Detectar Impresora", None, self.controller.redetect_printer)
+        self.btn_printer.pack(fill="x", pady=(0, 8))
+
         self.btn_admin = create_nav_tile(self.bottom_tools, "Administración", self.icon_admin, self.controller.open_admin_view)
         self.btn_admin.pack(fill="x", pady=(0, 4))
         
         ctk.CTkLabel(self.bottom_tools, text=f"{datetime.date.today()}", font=FONT_SMALL, text_color=COLOR_TEXT_LIGHT).pack(pady=(4,0))
         
-        self.after(2000, self.poll_server_status)
+        self.after(2000, self.start_status_listener)
 
 
     def update_totals(self, total_sum, total_items):
@@ -168,19 +174,38 @@ class RightPanel(ctk.CTkFrame):
             self.switch_void.configure(button_color=COLOR_PRIMARY, button_hover_color=COLOR_PRIMARY_HOVER)
 
     # --- Status & QR Logic ---
-    def poll_server_status(self):
+    STATUS_STREAM_URL = "http://127.0.0.1:5000/api/status/stream"
+    STATUS_RETRY_MAX = 5  # Seconds between reconnect attempts (backend starting/restarting)
+
+    def start_status_listener(self):
+        # Status changes are pushed by the backend (SSE); no polling from the Tk loop
+        threading.Thread(target=self._listen_server_status, daemon=True).start()
+
+    def _listen_server_status(self):
+        retry_delay = 1
+        while True:
+            try:
+                # Read timeout > server keepalive interval: a silent stream means the backend is gone
+                with requests.get(self.STATUS_STREAM_URL, stream=True, timeout=(3, 30)) as response:
+                    response.raise_for_status()
+                    retry_delay = 1
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line and line.startswith('data:'):
+                            data = json.loads(line[5:])
+                            self._set_status_color(data.get('color', STATUS_OFFLINE))
+            except Exception:
+                pass
+
+            self._set_status_color(STATUS_OFFLINE)
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, self.STATUS_RETRY_MAX)
+
+    def _set_status_color(self, color):
+        # Called from the listener thread: hand the update to the Tk loop
         try:
-            response = requests.get("http://127.0.0.1:5000/api/server_status", timeout=3)
-            if response.status_code == 200:
-                data = response.json()
-                color = data.get('color', STATUS_OFFLINE)
-            else:
-                color = STATUS_OFFLINE 
+            self.after(0, lambda: self.status_canvas.itemconfig(self.status_circle, fill=color))
         except Exception:
-            color = STATUS_OFFLINE 
-            
-        self.status_canvas.itemconfig(self.status_circle, fill=color)
-        self.after(3000, self.poll_server_status)
+            pass # Window closed
 
     def on_status_press(self, event):
         self.press_timer = self.after(2000, self.show_qr_code)
@@ -0,0 +1,143 @@
+"""
+Paquete de actualización en un solo archivo (pos_update.zip)
+Escribir un único archivo es mucho más rápido que miles de archivos sueltos en
+memorias USB FAT. El directorio central del zip sirve de índice: cada miembro
+se lee por separado y en streaming, sin extraer el paquete completo.
+
+Contenido: update_info.json, manifest.json, signature.json, files/..., dependencies/...
+La firma cubre update_info.json y manifest.json; el manifiesto a su vez tiene el
+SHA-256 de cada archivo, que se verifica al extraerlo.
+"""
+
+import os
+import hmac
+import json
+import hashlib
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+from update_manifest import MANIFEST_FILE
+
+ARCHIVE_NAME = 'pos_update.zip'
+INFO_FILE = 'update_info.json'
+SIGNATURE_FILE = 'signature.json'
+# Clave compartida opcional (HMAC); sin ella la firma solo detecta corrupción
+KEY_ENV_VAR = 'POS_UPDATE_KEY'
+
+# Ya comprimidos: guardarlos sin volver a comprimir
+STORED_SUFFIXES = ('.whl', '.zip', '.gz', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.pdf')
+COPY_BUFFER = 1024 * 1024
+
+def _signing_key() -> Optional[bytes]:
+    key = os.environ.get(KEY_ENV_VAR)
+    return key.encode('utf-8') if key else None
+
+def sign(info_bytes: bytes, manifest_bytes: bytes) -> dict:
+    """Firma de los metadatos del paquete (HMAC-SHA256 si hay clave, si no SHA-256)"""
+    payload = info_bytes + b'\0' + manifest_bytes
+    key = _signing_key()
+    if key:
+        return {'algorithm': 'hmac-sha256', 'digest': hmac.new(key, payload, hashlib.sha256).hexdigest()}
+    return {'algorithm': 'sha256', 'digest': hashlib.sha256(payload).hexdigest()}
+
+def write_archive(package_dir, archive_path) -> int:
+    """
+    Empaqueta un directorio pos_update/ (update_info.json, manifest.json, files/,
+    dependencies/) en un solo zip. Se escribe con nombre temporal y se renombra.
+
+    Returns:
+        Cantidad de miembros escritos
+    """
+    package_dir = Path(package_dir)
+    info_bytes = (package_dir / INFO_FILE).read_bytes()
+    manifest_bytes = (package_dir / MANIFEST_FILE).read_bytes()
+
+    tmp_path = f"{archive_path}.tmp"
+    count = 0
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        # Metadatos primero: se leen sin recorrer el resto del archivo
+        zf.writestr(INFO_FILE, info_bytes)
+        zf.writestr(MANIFEST_FILE, manifest_bytes)
+        zf.writestr(SIGNATURE_FILE, json.dumps(sign(info_bytes, manifest_bytes)))
+        for root, dirs, files in os.walk(package_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                path = Path(root, filename)
+                arcname = path.relative_to(package_dir).as_posix()
+                if arcname in (INFO_FILE, MANIFEST_FILE):
+                    continue
+                compress = zipfile.ZIP_STORED if filename.lower().endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+                zf.write(path, arcname, compress_type=compress)
+                count += 1
+    os.replace(tmp_path, archive_path)
+    return count
+
+class UpdateArchive:
+    """Lectura de un pos_update.zip con acceso aleatorio por miembro"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.zip = zipfile.ZipFile(self.path, 'r')
+        self.names = set(self.zip.namelist())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def read_bytes(self, name: str) -> bytes:
+        return self.zip.read(name)
+
+    def read_json(self, name: str) -> dict:
+        return json.loads(self.zip.read(name).decode('utf-8'))
+
+    def verify_signature(self) -> tuple[bool, str]:
+        """Comprueba la firma de update_info.json + manifest.json"""
+        for name in (INFO_FILE, MANIFEST_FILE, SIGNATURE_FILE):
+            if name not in self.names:
+                return False, f"falta {name}"
+        signature = self.read_json(SIGNATURE_FILE)
+        info_bytes, manifest_bytes = self.read_bytes(INFO_FILE), self.read_bytes(MANIFEST_FILE)
+
+        if signature.get('algorithm') == 'hmac-sha256' and not _signing_key():
+            return False, f"paquete firmado con clave pero {KEY_ENV_VAR} no está configurada"
+        if _signing_key() and signature.get('algorithm') != 'hmac-sha256':
+            return False, "paquete sin firma HMAC"
+
+        expected = sign(info_bytes, manifest_bytes)
+        if not hmac.compare_digest(expected['digest'], str(signature.get('digest', ''))):
+            return False, "firma inválida"
+        return True, "OK"
+
+    def members(self, prefix: str) -> list:
+        """Miembros (archivos) bajo un prefijo, ej. 'dependencies/'"""
+        return sorted(n for n in self.names if n.startswith(prefix) and not n.endswith('/'))
+
+    def extract(self, name: str, dest, expected_sha256: Optional[str] = None):
+        """
+        Extrae un miembro en streaming a dest, verificando su SHA-256 si se indica.
+        Lanza ValueError si el contenido no coincide (dest no se crea).
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        # Temporal propio junto al destino: extracciones concurrentes no chocan
+        fd, tmp_dest = tempfile.mkstemp(dir=dest.parent, prefix=dest.name + '.', suffix='.tmp')
+        try:
+            sha256 = hashlib.sha256()
+            with self.zip.open(name) as src, os.fdopen(fd, 'wb') as out:
+                while chunk := src.read(COPY_BUFFER):
+                    sha256.update(chunk)
+                    out.write(chunk)
+            if expected_sha256 and sha256.hexdigest() != expected_sha256:
+                raise ValueError(f"{name}: checksum incorrecto")
+            os.replace(tmp_dest, dest)
+        except BaseException:
+            if os.path.exists(tmp_dest):
+                os.remove(tmp_dest)
+            raise
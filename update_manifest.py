@@ -0,0 +1,104 @@
+"""
+Manifiesto por archivo de los paquetes de actualización
+Cada archivo se identifica por su ruta relativa, tamaño y SHA-256, lo que
+permite construir paquetes delta y verificar cada archivo al instalar
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Tuple
+
+MANIFEST_FILE = 'manifest.json'
+CHUNK_SIZE = 1024 * 1024
+
+# Datos generados en la instalación (imágenes subidas o importadas): no forman
+# parte de ninguna versión, nunca se empaquetan ni se eliminan al actualizar
+RUNTIME_DATA_DIRS = ('static/uploads', 'static/images/products')
+
+def is_runtime_data(rel: str) -> bool:
+    """True si rel está dentro de un directorio de datos de la instalación"""
+    return any(rel == d or rel.startswith(d + '/') for d in RUNTIME_DATA_DIRS)
+
+def file_sha256(path) -> str:
+    """Calcula el SHA-256 de un archivo leyendo por bloques"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def file_entry(path) -> dict:
+    """Entrada de manifiesto (tamaño y hash) para un archivo"""
+    return {'size': os.path.getsize(path), 'sha256': file_sha256(path)}
+
+def build_manifest(root, rel_paths: Iterable[str]) -> Dict[str, dict]:
+    """
+    Construye el manifiesto de los archivos indicados
+
+    Args:
+        root: Directorio base
+        rel_paths: Rutas relativas (con '/') de los archivos a incluir
+
+    Returns:
+        Dict ruta -> {'size', 'sha256'}
+    """
+    root = Path(root)
+    return {rel: file_entry(root / rel) for rel in sorted(rel_paths)}
+
+def manifest_checksum(files: Dict[str, dict]) -> str:
+    """Checksum global del contenido (equivale al antiguo files_checksum)"""
+    sha256 = hashlib.sha256()
+    for rel in sorted(files):
+        sha256.update(f"{rel}\0{files[rel]['sha256']}\n".encode('utf-8'))
+    return sha256.hexdigest()
+
+def diff_manifests(base: Dict[str, dict], new: Dict[str, dict]) -> Tuple[list, list]:
+    """
+    Compara dos manifiestos
+
+    Returns:
+        (archivos nuevos o modificados, archivos eliminados)
+    """
+    changed = [rel for rel, entry in new.items() if base.get(rel) != entry]
+    removed = [rel for rel in base if rel not in new]
+    return sorted(changed), sorted(removed)
+
+def is_safe_relative_path(rel) -> bool:
+    """
+    True si rel es una ruta relativa con '/' que no puede salir del directorio
+    base: sin raíz ni unidad, sin '..' y sin separadores de Windows
+    """
+    if not isinstance(rel, str) or not rel or '\\' in rel or ':' in rel or '\0' in rel:
+        return False
+    path = PurePosixPath(rel)
+    return not path.is_absolute() and all(part not in ('', '.', '..') for part in rel.split('/'))
+
+def safe_join(base, rel) -> Path:
+    """
+    base / rel, verificando que el resultado quede dentro de base
+    Lanza ValueError si rel no es segura
+    """
+    if not is_safe_relative_path(rel):
+        raise ValueError(f"ruta no permitida: {rel!r}")
+    base = Path(base)
+    dest = base / rel
+    if not dest.resolve().is_relative_to(base.resolve()):
+        raise ValueError(f"ruta fuera del destino: {rel!r}")
+    return dest
+
+def unsafe_manifest_paths(manifest: dict) -> list:
+    """Rutas de files/delta/removed del manifiesto que no son seguras"""
+    paths = list(manifest.get('files', {})) + list(manifest.get('delta', [])) + list(manifest.get('removed', []))
+    return sorted({str(rel) for rel in paths if not is_safe_relative_path(rel)})
+
+def load_manifest(path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(path, manifest: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -9,24 +9,61 @@ import shutil
 import subprocess
 import json
 import hashlib
+import fnmatch
+import argparse
+import re
+import threading
+import time
+from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 import version
+from update_manifest import (MANIFEST_FILE, file_sha256, load_manifest, save_manifest,
+                             safe_join, unsafe_manifest_paths, is_runtime_data)
+from update_archive import INFO_FILE, UpdateArchive
+import launcher
+try:
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    Version = None
+from launcher import VERSIONS_DIR, ACTIVE_VERSION_FILE
+
+# Hilos para verificar/copiar archivos (E/S de USB y disco)
+INSTALL_WORKERS = 4
+
+PIP_TIMEOUT = 300  # Segundos
+
+# Respaldos: cantidad de snapshots conservados e índice de cada snapshot
+# (versions/ se excluye del recorrido; la versión activa se agrega aparte)
+BACKUP_KEEP = 5
+SNAPSHOT_INDEX = '.snapshot.json'
+BACKUP_EXCLUDE = {
+    '.git', '.venv', '__pycache__', '*.pyc', '*.pyo', VERSIONS_DIR,
+    'backups', 'update_temp', '*.db', '*.db-journal', '*.db-wal', '*.db-shm'
+}
+
+# Versiones instaladas conservadas en versions/ (además de la activa y la anterior)
+VERSIONS_KEEP = 3
 
 class Updater:
     """
     Maneja el proceso de actualización completo
     """
     
-    def __init__(self, app_root: str):
+    def __init__(self, app_root: str, staged: bool = True):
         """
         Inicializa el updater
         
         Args:
             app_root: Directorio raíz de la aplicación
+            staged: Instalar en versions/<versión> y activar al final (paquetes con
+                    manifiesto) en lugar de sobrescribir la instalación en uso
         """
         self.app_root = Path(app_root)
+        self.staged = staged
+        self.versions_dir = self.app_root / VERSIONS_DIR
         self.backup_dir = self.app_root / 'backups'
         self.temp_dir = self.app_root / 'update_temp'
         
@@ -60,11 +97,54 @@ class Updater:
         if not package_path.exists():
             return False, "Ruta del paquete no existe"
         
+        # Un paquete delta solo contiene cambios respecto a su versión base
+        base_version = update_info.get('base_version')
+        if base_version and base_version != current_version:
+            return False, f"El paquete delta requiere la versión {base_version} (instalada: {current_version})"
+        
         return True, "OK"
     
+    def _iter_app_files(self):
+        """
+        Rutas relativas (con '/') de los archivos a respaldar: la raíz y, con
+        instalación escalonada, el código de la versión activa (versions/<v>)
+        """
+        def excluded(name: str) -> bool:
+            return any(fnmatch.fnmatch(name, pattern) for pattern in BACKUP_EXCLUDE)
+        
+        roots = [self.app_root]
+        active_dir = Path(launcher.active_code_dir(str(self.app_root)))
+        if active_dir != self.app_root:
+            roots.append(active_dir)
+        
+        for top in roots:
+            for root, dirs, files in os.walk(top):
+                dirs[:] = [d for d in dirs if not excluded(d)]
+                for filename in files:
+                    if not excluded(filename):
+                        yield Path(root, filename).relative_to(self.app_root).as_posix()
+    
+    def list_backups(self) -> list:
+        """Snapshots existentes, del más antiguo al más reciente"""
+        if not self.backup_dir.exists():
+            return []
+        # backup_v<versión>_<YYYYmmdd>_<HHMMSS>: ordenar por la fecha, no por la versión
+        return sorted((p for p in self.backup_dir.iterdir() if p.is_dir() and p.name.startswith('backup_')),
+                      key=lambda p: p.name.split('_')[-2:])
+    
+    def _load_snapshot_index(self, snapshot: Path) -> dict:
+        try:
+            with open(snapshot / SNAPSHOT_INDEX, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
     def create_backup(self) -> Path:
         """
-        Crea un respaldo de la instalación actual
+        Crea un snapshot de la instalación actual
+        Los archivos sin cambios respecto al snapshot anterior (mismo tamaño y
+        fecha de modificación) se enlazan con hard links en lugar de copiarse,
+        así el tiempo y el espacio crecen con el tamaño del cambio.
         
         Returns:
             Path del directorio de respaldo
@@ -72,6 +152,10 @@ class Updater:
         # Crear directorio de backups si no existe
         self.backup_dir.mkdir(exist_ok=True)
         
+        previous = self.list_backups()
+        previous = previous[-1] if previous else None
+        previous_index = self._load_snapshot_index(previous) if previous else {}
+        
         # Nombre de backup con timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_name = f"backup_v{version.VERSION}_{timestamp}"
@@ -79,49 +163,175 @@ class Updater:
         
         print(f"Updater: Creando respaldo en {backup_path}")
         
-        # Exclusiones
-        exclude_patterns = {
-            '.git', '.venv', '__pycache__', '*.pyc', '*.pyo',
-            'backups', 'update_temp', '*.db', '*.db-journal'
-        }
-        
-        def should_exclude(path: Path) -> bool:
-            """Verifica si un path debe ser excluido del backup"""
-            for pattern in exclude_patterns:
-                if pattern.startswith('*'):
-                    # Pattern de extensión
-                    if path.suffix == pattern[1:]:
-                        return True
-                elif path.name == pattern:
-                    return True
-            return False
-        
-        # Copiar archivos
         backup_path.mkdir(parents=True, exist_ok=True)
+        index = {}
+        linked = copied = 0
         
-        for item in self.app_root.iterdir():
-            if should_exclude(item):
-                continue
-            
-            dest = backup_path / item.name
-            
+        for rel in self._iter_app_files():
+            source = self.app_root / rel
+            dest = backup_path / rel
             try:
-                if item.is_dir():
-                    shutil.copytree(item, dest, ignore=shutil.ignore_patterns(*exclude_patterns))
-                else:
-                    shutil.copy2(item, dest)
+                stat = source.stat()
+                entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                
+                if previous_index.get(rel) == entry:
+                    try:
+                        os.link(previous / rel, dest)
+                        linked += 1
+                        index[rel] = entry
+                        continue
+                    except OSError:
+                        # Sin soporte de hard links (FAT, otro volumen): copiar
+                        pass
+                
+                shutil.copy2(source, dest)
+                copied += 1
+                index[rel] = entry
             except Exception as e:
-                print(f"Updater: Advertencia - Error copiando {item}: {e}")
+                print(f"Updater: Advertencia - Error copiando {rel}: {e}")
+        
+        with open(backup_path / SNAPSHOT_INDEX, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
         
-        print(f"Updater: Respaldo completado")
+        print(f"Updater: Respaldo completado ({copied} copiados, {linked} sin cambios enlazados)")
+        self.prune_backups()
         return backup_path
     
-    def install_dependencies(self, package_path: Path) -> bool:
+    def prune_backups(self, keep: int = BACKUP_KEEP):
+        """Elimina los snapshots más antiguos, conservando los últimos `keep`"""
+        backups = self.list_backups()
+        for old in backups[:-keep] if keep > 0 else backups:
+            try:
+                shutil.rmtree(old)
+                print(f"Updater: Respaldo antiguo eliminado {old.name}")
+            except Exception as e:
+                print(f"Updater: Error eliminando respaldo {old.name}: {e}")
+    
+    def restore_backup(self, snapshot: Optional[str] = None) -> bool:
+        """
+        Restaura la instalación desde un snapshot (rollback)
+        Los archivos se copian (no se enlazan) para no modificar el snapshot.
+        No se borran archivos creados después del snapshot (ej. imágenes subidas).
+        Se restaura también la versión que estaba activa (versions/<v> y
+        active_version.json), que se escribe al final.
+        
+        Args:
+            snapshot: Nombre o ruta del snapshot; None = el más reciente
+        
+        Returns:
+            True si exitoso, False si hubo error
+        """
+        if snapshot is None:
+            backups = self.list_backups()
+            if not backups:
+                print("Updater: No hay respaldos")
+                return False
+            snapshot_path = backups[-1]
+        else:
+            snapshot_path = Path(snapshot)
+            if not snapshot_path.is_dir():
+                snapshot_path = self.backup_dir / snapshot
+        
+        if not snapshot_path.is_dir():
+            print(f"Updater: Respaldo no encontrado: {snapshot}")
+            return False
+        
+        print(f"Updater: Restaurando {snapshot_path.name}")
+        pointer = snapshot_path / ACTIVE_VERSION_FILE
+        try:
+            for item in snapshot_path.rglob('*'):
+                if not item.is_file() or item.name == SNAPSHOT_INDEX or item == pointer:
+                    continue
+                self._restore_file(snapshot_path, item)
+            
+            # La versión activa cambia solo cuando su código ya está en su lugar
+            if pointer.is_file():
+                self._restore_file(snapshot_path, pointer)
+            elif (self.app_root / ACTIVE_VERSION_FILE).exists():
+                # El snapshot es de antes de las instalaciones escalonadas
+                self.activate_version(None)
+            print("Updater: Restauración completada")
+            return True
+        except Exception as e:
+            print(f"Updater: Error restaurando respaldo: {e}")
+            return False
+    
+    def _restore_file(self, snapshot_path: Path, item: Path):
+        dest = self.app_root / item.relative_to(snapshot_path)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dest = dest.with_name(dest.name + '.update_tmp')
+        shutil.copy2(item, tmp_dest)
+        os.replace(tmp_dest, dest)
+    
+    @staticmethod
+    def parse_distribution_file(filename: str) -> Optional[tuple]:
+        """
+        Obtiene (nombre normalizado, versión) de un wheel o sdist
+        ej: 'Flask_Cors-4.0.0-py2.py3-none-any.whl' -> ('flask-cors', '4.0.0')
         """
-        Instala dependencias desde wheels en el paquete
+        if filename.endswith('.whl'):
+            parts = filename[:-4].split('-')
+            if len(parts) < 5:
+                return None
+            name, dist_version = parts[0], parts[1]
+        else:
+            stem = re.sub(r'\.(tar\.gz|zip)$', '', filename)
+            if stem == filename or '-' not in stem:
+                return None
+            name, dist_version = stem.rsplit('-', 1)
+        return re.sub(r'[-_.]+', '-', name).lower(), dist_version
+    
+    @staticmethod
+    def installed_version(name: str) -> Optional[str]:
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return None
+    
+    @staticmethod
+    def same_version(installed: Optional[str], dist_version: str) -> bool:
+        """Compara versiones normalizadas (PEP 440): '1.0' == '1.0.0'"""
+        if installed is None:
+            return False
+        if Version:
+            try:
+                return Version(installed) == Version(dist_version)
+            except InvalidVersion:
+                pass
+        # Sin packaging: ceros finales no cuentan
+        def strip(v: str) -> str:
+            return re.sub(r'(\.0+)+$', '', v.strip().lower())
+        return strip(installed) == strip(dist_version)
+    
+    def select_dependencies(self, deps_dir: Path) -> list:
+        """
+        Paquetes de la carpeta de dependencias cuya versión no coincide con la
+        instalada en el entorno actual (o que no están instalados)
+        """
+        selected = []
+        for dist_file in sorted(deps_dir.iterdir()):
+            parsed = self.parse_distribution_file(dist_file.name)
+            if not parsed:
+                continue
+            name, dist_version = parsed
+            installed = self.installed_version(name)
+            if not self.same_version(installed, dist_version):
+                print(f"Updater: {name} {installed or '(no instalado)'} -> {dist_version}")
+                selected.append(dist_file)
+        return selected
+    
+    def install_dependencies(self, package_path: Path, expected_hashes: Optional[dict] = None,
+                             progress_callback=None) -> bool:
+        """
+        Instala las dependencias del paquete que cambiaron
+        Solo se pasan a pip los wheels cuya versión difiere de la instalada;
+        si no cambió ninguna, pip no se ejecuta.
         
         Args:
             package_path: Ruta al paquete de actualización
+            expected_hashes: nombre de archivo -> SHA-256 (update_info 'dependency_files')
+            progress_callback: Función llamada con cada línea de salida de pip
         
         Returns:
             True si exitoso, False si hubo error
@@ -132,49 +342,66 @@ class Updater:
             print("Updater: Advertencia - No hay carpeta de dependencias")
             return True
         
+        print(f"Updater: Comparando dependencias de {deps_dir}")
+        wheels = self.select_dependencies(deps_dir)
+        
+        if not wheels:
+            print("Updater: Dependencias al día, no se ejecuta pip")
+            return True
+        
+        # Verificar los archivos antes de instalar nada
+        if expected_hashes:
+            for wheel in wheels:
+                expected = expected_hashes.get(wheel.name)
+                if expected is None or file_sha256(wheel) != expected:
+                    print(f"Updater: Error - {wheel.name} no coincide con el checksum del paquete")
+                    return False
+        
         # Obtener Python executable del virtualenv actual
         python_exe = sys.executable
         
-        print(f"Updater: Instalando dependencias desde {deps_dir}")
+        cmd = [
+            python_exe, '-m', 'pip', 'install',
+            '--no-index',  # No usar PyPI
+            '--no-deps',  # Las dependencias transitivas también vienen en el paquete
+            '--find-links', str(deps_dir),  # Buscar en directorio de wheels
+        ] + [str(w) for w in wheels]
         
-        # Obtener lista de wheels
-        wheels = list(deps_dir.glob('*.whl'))
-        
-        if not wheels:
-            print("Updater: No hay wheels para instalar")
-            return True
+        print(f"Updater: Ejecutando: {' '.join(cmd[:7])}... ({len(wheels)} paquetes)")
         
         try:
-            # Instalar todos los wheels con --force-reinstall para manejar cambios de versión
-            wheel_paths = [str(w) for w in wheels]
-            
-            cmd = [
-                python_exe, '-m', 'pip', 'install',
-                '--force-reinstall',  # Fuerza reinstalación (permite cambios de versión)
-                '--no-index',  # No usar PyPI
-                '--find-links', str(deps_dir),  # Buscar en directorio de wheels
-            ] + wheel_paths
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, bufsize=1)
+            # La salida se muestra mientras pip avanza; el timer corta un pip colgado
+            timed_out = threading.Event()
             
-            print(f"Updater: Ejecutando: {' '.join(cmd[:6])}... ({len(wheels)} wheels)")
+            def kill_on_timeout():
+                timed_out.set()
+                process.kill()
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutos timeout
-            )
+            timer = threading.Timer(PIP_TIMEOUT, kill_on_timeout)
+            timer.start()
+            try:
+                for line in process.stdout:
+                    line = line.rstrip()
+                    if line:
+                        print(f"Updater: pip | {line}")
+                        if progress_callback:
+                            progress_callback(line)
+                process.wait()
+            finally:
+                timer.cancel()
             
-            if result.returncode != 0:
-                print(f"Updater: Error instalando dependencias:")
-                print(result.stderr)
+            if timed_out.is_set():
+                print("Updater: Timeout instalando dependencias")
+                return False
+            if process.returncode != 0:
+                print(f"Updater: Error instalando dependencias (código {process.returncode})")
                 return False
             
             print("Updater: Dependencias instaladas exitosamente")
             return True
             
-        except subprocess.TimeoutExpired:
-            print("Updater: Timeout instalando dependencias")
-            return False
         except Exception as e:
             print(f"Updater: Error instalando dependencias: {e}")
             return False
@@ -197,10 +424,16 @@ class Updater:
         
         print(f"Updater: Instalando archivos desde {files_dir}")
         
+        manifest_path = package_path / MANIFEST_FILE
+        if manifest_path.exists():
+            return self.install_files_from_manifest(files_dir, load_manifest(manifest_path))
+        
         # Exclusiones (archivos que NO deben ser sobrescritos)
         exclude_files = {
             'pos_system.db',  # Base de datos
             '*.db-journal',
+            '*.db-wal',
+            '*.db-shm',
             '*.db'
         }
         
@@ -240,6 +473,281 @@ class Updater:
             print(f"Updater: Error instalando archivos: {e}")
             return False
     
+    def install_files_from_manifest(self, files_dir: Path, manifest: dict) -> bool:
+        """
+        Instala solo los archivos del delta del manifiesto
+        Primero verifica tamaño y SHA-256 de cada archivo del paquete (en paralelo);
+        si alguno está corrupto no se modifica nada. Luego copia en paralelo con
+        escritura atómica y elimina los archivos que ya no existen en la versión.
+        
+        Args:
+            files_dir: Carpeta 'files' del paquete
+            manifest: Manifiesto del paquete
+        
+        Returns:
+            True si exitoso, False si hubo error
+        """
+        entries = manifest['files']
+        delta = manifest.get('delta', list(entries))
+        
+        unsafe = unsafe_manifest_paths(manifest)
+        if unsafe:
+            print("Updater: Manifiesto con rutas no permitidas, no se instaló nada:")
+            for rel in unsafe:
+                print(f"  ✗ {rel}")
+            return False
+        
+        def verify(rel: str) -> Optional[str]:
+            source = safe_join(files_dir, rel)
+            expected = entries[rel]
+            if not source.is_file():
+                return f"{rel}: falta en el paquete"
+            if source.stat().st_size != expected['size']:
+                return f"{rel}: tamaño incorrecto"
+            if file_sha256(source) != expected['sha256']:
+                return f"{rel}: checksum incorrecto"
+            return None
+        
+        def copy(rel: str):
+            dest = safe_join(self.app_root, rel)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_dest = dest.with_name(dest.name + '.update_tmp')
+            shutil.copy2(safe_join(files_dir, rel), tmp_dest)
+            os.replace(tmp_dest, dest)
+        
+        try:
+            print(f"Updater: Verificando {len(delta)} archivos ({len(entries)} en la versión)")
+            with ThreadPoolExecutor(max_workers=INSTALL_WORKERS) as pool:
+                errors = [e for e in pool.map(verify, delta) if e]
+            if errors:
+                print("Updater: Paquete corrupto, no se instaló nada:")
+                for error in errors:
+                    print(f"  ✗ {error}")
+                return False
+            
+            with ThreadPoolExecutor(max_workers=INSTALL_WORKERS) as pool:
+                for rel, _ in zip(delta, pool.map(copy, delta)):
+                    print(f"Updater: Actualizado {rel}")
+            
+            for rel in manifest.get('removed', []):
+                # Imágenes subidas/importadas: datos de la instalación, no del paquete
+                if is_runtime_data(rel):
+                    continue
+                path = safe_join(self.app_root, rel)
+                if path.is_file():
+                    path.unlink()
+                    print(f"Updater: Eliminado {rel}")
+            
+            # Estado instalado: base para verificar futuras instalaciones
+            save_manifest(self.app_root / MANIFEST_FILE, manifest)
+            
+            print("Updater: Archivos instalados exitosamente")
+            return True
+            
+        except Exception as e:
+            print(f"Updater: Error instalando archivos: {e}")
+            return False
+    
+    def prepare_archive(self, archive_path: Path) -> Optional[Path]:
+        """
+        Extrae de un pos_update.zip solo lo necesario a update_temp/pos_update:
+        metadatos, archivos del delta (verificando su SHA-256 en streaming) y las
+        dependencias cuya versión difiere de la instalada.
+        
+        Returns:
+            Directorio con la estructura de un paquete en carpeta, None si hubo error
+        """
+        dest = self.temp_dir / 'pos_update'
+        if dest.exists():
+            shutil.rmtree(dest)
+        (dest / 'files').mkdir(parents=True)
+        (dest / 'dependencies').mkdir()
+        
+        try:
+            with UpdateArchive(archive_path) as archive:
+                valid, message = archive.verify_signature()
+                if not valid:
+                    print(f"Updater: Paquete inválido - {message}")
+                    return None
+                
+                manifest = archive.read_json(MANIFEST_FILE)
+                entries = manifest['files']
+                delta = manifest.get('delta', list(entries))
+                
+                # Las rutas salen del paquete: nada puede escribirse fuera de dest
+                unsafe = unsafe_manifest_paths(manifest)
+                dependency_names = archive.members('dependencies/')
+                unsafe += [name for name in dependency_names if '/' in name[len('dependencies/'):]]
+                if unsafe:
+                    print("Updater: Paquete inválido - rutas no permitidas:")
+                    for rel in unsafe:
+                        print(f"  ✗ {rel}")
+                    return None
+                files_dest = {rel: safe_join(dest / 'files', rel) for rel in delta}
+                dependency_dest = {name: safe_join(dest / 'dependencies', name[len('dependencies/'):])
+                                   for name in dependency_names}
+                
+                for name in (INFO_FILE, MANIFEST_FILE):
+                    (dest / name).write_bytes(archive.read_bytes(name))
+                
+                def extract_file(rel: str):
+                    archive.extract(f"files/{rel}", files_dest[rel], entries[rel]['sha256'])
+                
+                print(f"Updater: Extrayendo {len(delta)} archivos de {archive_path.name}")
+                with ThreadPoolExecutor(max_workers=INSTALL_WORKERS) as pool:
+                    list(pool.map(extract_file, delta))
+                
+                for name, dependency_path in dependency_dest.items():
+                    parsed = self.parse_distribution_file(dependency_path.name)
+                    if parsed and self.same_version(self.installed_version(parsed[0]), parsed[1]):
+                        continue
+                    archive.extract(name, dependency_path)
+            
+            return dest
+            
+        except Exception as e:
+            print(f"Updater: Error extrayendo paquete: {e}")
+            return None
+    
+    def stage_update(self, package_path: Path, manifest: dict, expected_version: str) -> Optional[Path]:
+        """
+        Materializa la nueva versión completa en versions/<versión>
+        Los archivos del delta vienen del paquete y el resto de la versión activa;
+        todos se verifican contra el manifiesto. Se escribe en un directorio
+        '.staging' que se renombra al terminar, así nunca queda una versión a medias.
+        
+        Args:
+            package_path: Directorio del paquete (con files/)
+            manifest: Manifiesto del paquete
+            expected_version: Versión ya validada de update_info.json
+        
+        Returns:
+            Directorio de la versión preparada, None si hubo error
+        """
+        files_dir = package_path / 'files'
+        source_dir = Path(launcher.active_code_dir(str(self.app_root)))
+        entries = manifest['files']
+        delta = set(manifest.get('delta', entries))
+        
+        # La versión se usa como nombre de directorio: solo X.Y.Z y la misma de update_info
+        version_name = manifest.get('version')
+        try:
+            valid_version = (version_name == expected_version and
+                             '.'.join(str(n) for n in version.parse_version(version_name)) == version_name)
+        except (ValueError, AttributeError):
+            valid_version = False
+        if not valid_version:
+            print(f"Updater: Versión del manifiesto inválida ({version_name!r}, se esperaba {expected_version})")
+            return None
+        unsafe = unsafe_manifest_paths(manifest)
+        if unsafe:
+            print("Updater: Manifiesto con rutas no permitidas:")
+            for rel in unsafe:
+                print(f"  ✗ {rel}")
+            return None
+        
+        target = self.versions_dir / version_name
+        staging = target.with_name(target.name + '.staging')
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        
+        def materialize(rel: str) -> Optional[str]:
+            from_package = rel in delta
+            source = safe_join(files_dir if from_package else source_dir, rel)
+            origin = "paquete" if from_package else "instalación actual"
+            if not source.is_file():
+                return f"{rel}: falta en {origin}"
+            if source.stat().st_size != entries[rel]['size'] or file_sha256(source) != entries[rel]['sha256']:
+                return f"{rel}: checksum incorrecto ({origin})"
+            dest = safe_join(staging, rel)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, dest)
+            return None
+        
+        print(f"Updater: Preparando {target} ({len(delta)} archivos del paquete, "
+              f"{len(entries) - len(delta)} de {source_dir})")
+        try:
+            with ThreadPoolExecutor(max_workers=INSTALL_WORKERS) as pool:
+                errors = [e for e in pool.map(materialize, sorted(entries)) if e]
+            if errors:
+                print("Updater: No se pudo preparar la versión:")
+                for error in errors:
+                    print(f"  ✗ {error}")
+                shutil.rmtree(staging, ignore_errors=True)
+                return None
+            
+            save_manifest(staging / MANIFEST_FILE, manifest)
+            if target.exists():
+                shutil.rmtree(target)
+            os.replace(staging, target)
+            return target
+        except Exception as e:
+            print(f"Updater: Error preparando versión: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+    
+    def activate_version(self, version_name: Optional[str]):
+        """
+        Cambia la versión activa reescribiendo active_version.json de forma
+        atómica (os.replace). None vuelve a la instalación de la raíz.
+        """
+        pointer = self.app_root / ACTIVE_VERSION_FILE
+        current = launcher.read_active_version(str(self.app_root))
+        if version_name is None:
+            if pointer.exists():
+                pointer.unlink()
+            print("Updater: Versión activa: instalación de la raíz")
+            return
+        
+        data = {
+            'version': version_name,
+            'previous': current['version'] if current else None,
+            'activated_at': datetime.now().isoformat()
+        }
+        tmp_pointer = pointer.with_name(pointer.name + '.tmp')
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_pointer, pointer)
+        print(f"Updater: Versión activa: {version_name}")
+    
+    def rollback_version(self) -> bool:
+        """Reactiva la versión anterior (instantáneo, sin copiar archivos)"""
+        current = launcher.read_active_version(str(self.app_root))
+        if not current:
+            print("Updater: No hay versión anterior a la cual volver")
+            return False
+        self.activate_version(current.get('previous'))
+        return True
+    
+    def prune_versions(self, keep: int = VERSIONS_KEEP):
+        """Elimina versiones viejas de versions/, nunca la activa ni la anterior"""
+        if not self.versions_dir.exists():
+            return
+        current = launcher.read_active_version(str(self.app_root)) or {}
+        protected = {current.get('version'), current.get('previous')}
+        installed = sorted((p for p in self.versions_dir.iterdir()
+                            if p.is_dir() and not p.name.endswith('.staging')),
+                           key=lambda p: p.stat().st_mtime)
+        for old in installed[:-keep] if keep > 0 else installed:
+            if old.name not in protected:
+                shutil.rmtree(old, ignore_errors=True)
+                print(f"Updater: Versión antigua eliminada {old.name}")
+    
+    def _bootstrap_root_entry(self, version_dir: Path):
+        """
+        Primera instalación escalonada: la raíz aún tiene el pos_app.py antiguo
+        (sin redirección a la versión activa) y no tiene launcher.py
+        """
+        if Path(launcher.active_code_dir(str(self.app_root))) != self.app_root:
+            return
+        for name in ('launcher.py', launcher.MAIN_SCRIPT, 'launch_app.bat'):
+            source = version_dir / name
+            if source.is_file():
+                tmp_dest = self.app_root / (name + '.update_tmp')
+                shutil.copy2(source, tmp_dest)
+                os.replace(tmp_dest, self.app_root / name)
+    
     def cleanup_temp(self):
         """Limpia archivos temporales"""
         if self.temp_dir.exists():
@@ -272,6 +780,14 @@ class Updater:
                 print(f"Updater: No se puede actualizar - {msg}")
                 return False
             
+            # Paquete en un solo archivo: extraer solo lo que cambia
+            if package_path.is_file():
+                print(f"\nExtrayendo {package_path.name}...")
+                package_path = self.prepare_archive(package_path)
+                if not package_path:
+                    print("✗ Error extrayendo el paquete")
+                    return False
+            
             # 2. Crear respaldo
             print("\n[1/4] Creando respaldo...")
             backup_path = self.create_backup()
@@ -279,17 +795,33 @@ class Updater:
             
             # 3. Instalar dependencias
             print("\n[2/4] Instalando dependencias...")
-            if not self.install_dependencies(package_path):
+            if not self.install_dependencies(package_path, update_info.get('dependency_files')):
                 print("✗ Error instalando dependencias")
                 return False
             print("✓ Dependencias instaladas")
             
             # 4. Instalar archivos
             print("\n[3/4] Instalando archivos...")
-            if not self.install_files(package_path):
-                print("✗ Error instalando archivos")
-                return False
-            print("✓ Archivos instalados")
+            manifest_path = package_path / MANIFEST_FILE
+            if self.staged and manifest_path.exists():
+                # La versión en uso no se toca: se prepara al lado y se activa al final
+                version_dir = self.stage_update(package_path, load_manifest(manifest_path),
+                                                 update_info['version'])
+                if not version_dir:
+                    print("✗ Error preparando la nueva versión")
+                    return False
+                self._bootstrap_root_entry(version_dir)
+                self.activate_version(version_dir.name)
+                self.prune_versions()
+                print(f"✓ Versión {version_dir.name} activada (se usará al reiniciar)")
+            else:
+                if Path(launcher.active_code_dir(str(self.app_root))) != self.app_root:
+                    print("✗ Paquete sin manifiesto: no se puede instalar sobre una versión escalonada")
+                    return False
+                if not self.install_files(package_path):
+                    print("✗ Error instalando archivos")
+                    return False
+                print("✓ Archivos instalados")
             
             # 5. Limpiar archivos temporales
             print("\n[4/4] Limpiando archivos temporales...")
@@ -307,6 +839,7 @@ class Updater:
         except Exception as e:
             print(f"\nUpdater: ERROR DURANTE ACTUALIZACIÓN: {e}")
             print(f"Puede restaurar desde respaldo en: {self.backup_dir}")
+            print("  (python updater.py --rollback [SNAPSHOT])")
             return False
     
     def restart_application(self):
@@ -315,8 +848,10 @@ class Updater:
         """
         print("\nUpdater: Reiniciando aplicación...")
         
-        # Obtener el script principal
-        main_script = self.app_root / 'pos_app.py'
+        # El lanzador elige la versión activa
+        main_script = self.app_root / 'launcher.py'
+        if not main_script.exists():
+            main_script = self.app_root / 'pos_app.py'
         python_exe = sys.executable
         
         # Lanzar nueva instancia
@@ -329,3 +864,25 @@ class Updater:
         # Salir de la instancia actual
         print("Updater: Saliendo de instancia actual...")
         sys.exit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Respaldos de la instalación")
+    parser.add_argument("--list", action="store_true", help="Lista los respaldos disponibles")
+    parser.add_argument("--backup", action="store_true", help="Crea un respaldo ahora")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="SNAPSHOT",
+                        help="Restaura un respaldo (default: el más reciente)")
+    parser.add_argument("--previous-version", action="store_true",
+                        help="Reactiva la versión instalada anterior (instalación escalonada)")
+    args = parser.parse_args()
+    
+    updater = Updater(launcher.find_app_root(__file__))
+    if args.previous_version:
+        sys.exit(0 if updater.rollback_version() else 1)
+    elif args.backup:
+        updater.create_backup()
+    elif args.rollback is not None:
+        sys.exit(0 if updater.restore_backup(args.rollback or None) else 1)
+    else:
+        for backup in updater.list_backups():
+            print(backup.name)
@@ -1,50 +1,117 @@
 """
 Monitor de USB para detectar actualizaciones automáticas
-Busca carpeta 'pos_update/' en unidades USB conectadas
+Busca 'pos_update.zip' o la carpeta 'pos_update/' en unidades USB conectadas
 """
 
 import os
+import sys
 import json
 import time
+import select
 import threading
 import psutil
-from typing import Callable, Optional, Set
+from typing import Callable, Optional, Set, Iterable
+from update_archive import ARCHIVE_NAME, INFO_FILE, UpdateArchive
+
+# Directorios donde Linux monta unidades removibles (udisks, montaje manual)
+LINUX_MEDIA_DIRS = ('/media/', '/run/media/', '/mnt/')
+
+class MountTableWatcher:
+    """
+    Espera cambios en la tabla de montajes de Linux sin sondear: el kernel
+    marca /proc/self/mounts con POLLPRI cada vez que se monta o desmonta algo.
+    Un pipe interno permite despertar la espera para detener el monitor.
+    """
+
+    def __init__(self):
+        self.mounts = open('/proc/self/mounts', 'rb')
+        self.mounts.read()
+        self.wake_r, self.wake_w = os.pipe()
+        self.poller = select.poll()
+        self.poller.register(self.mounts.fileno(), select.POLLPRI | select.POLLERR)
+        self.poller.register(self.wake_r, select.POLLIN)
+
+    def wait(self) -> bool:
+        """Bloquea hasta un cambio de montajes (True) o hasta wake() (False)"""
+        for fd, _ in self.poller.poll():
+            if fd == self.wake_r:
+                os.read(self.wake_r, 64)
+                return False
+        # Releer el archivo rearma la notificación
+        self.mounts.seek(0)
+        self.mounts.read()
+        return True
+
+    def wake(self):
+        os.write(self.wake_w, b'x')
+
+    def close(self):
+        self.mounts.close()
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+def create_mount_watcher() -> Optional[MountTableWatcher]:
+    """Devuelve un watcher por eventos si la plataforma lo soporta, o None (sondeo)"""
+    if not sys.platform.startswith('linux') or not hasattr(select, 'poll'):
+        return None
+    try:
+        return MountTableWatcher()
+    except OSError as e:
+        print(f"USB Monitor: Sin eventos de montaje ({e}), usando sondeo")
+        return None
 
 class USBMonitor:
     """
     Monitorea conexiones de USB y detecta paquetes de actualización
     """
     
-    def __init__(self, update_callback: Callable, check_interval: float = 2.0):
+    def __init__(self, update_callback: Callable, check_interval: float = 2.0,
+                 max_interval: float = 10.0, use_events: bool = True):
         """
         Inicializa el monitor de USB
         
         Args:
             update_callback: Función a llamar cuando se detecta actualización
             check_interval: Intervalo en segundos entre verificaciones (default: 2.0)
+            max_interval: Intervalo máximo del sondeo cuando no hay cambios (default: 10.0)
+            use_events: Usar eventos del sistema (Linux) en lugar de sondeo si es posible
         """
         self.update_callback = update_callback
         self.check_interval = check_interval
+        self.max_interval = max_interval
+        self.use_events = use_events
         self.running = False
         self.thread: Optional[threading.Thread] = None
         self.known_drives: Set[str] = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watcher: Optional[MountTableWatcher] = None
         
     def start(self):
         """Inicia el monitoreo en un thread daemon"""
         if not self.running:
             self.running = True
+            self.stop_event.clear()
             self.known_drives = self._get_current_drives()
+            self.watcher = create_mount_watcher() if self.use_events else None
             self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
             self.thread.start()
-            print("USB Monitor: Iniciado (Thread launched)")
+            mode = "eventos" if self.watcher else "sondeo adaptativo"
+            print(f"USB Monitor: Iniciado (Thread launched, {mode})")
         else:
              print("USB Monitor: Ya estaba corriendo")
     
     def stop(self):
         """Detiene el monitoreo"""
         self.running = False
+        self.stop_event.set()
+        if self.watcher:
+            self.watcher.wake()
         if self.thread:
             self.thread.join(timeout=5)
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
         print("USB Monitor: Detenido")
     
     def _get_current_drives(self) -> Set[str]:
@@ -52,7 +119,7 @@ class USBMonitor:
         Obtiene lista de unidades actualmente montadas
         
         Returns:
-            Set de letras de unidad (ej: {'C:\\', 'D:\\'})
+            Set de letras de unidad (ej: {'C:\\', 'D:\\'}) o puntos de montaje en Linux
         """
         drives = set()
         # print("DEBUG: Checking partitions...") # Granular debug
@@ -60,8 +127,48 @@ class USBMonitor:
             # Solo unidades removibles (USB) y fijas
             if 'removable' in partition.opts.lower() or 'fixed' in partition.opts.lower():
                 drives.add(partition.mountpoint)
+            # En Linux opts son opciones de montaje: usar la ruta de montaje
+            elif partition.mountpoint.startswith(LINUX_MEDIA_DIRS):
+                drives.add(partition.mountpoint)
         return drives
     
+    def check_now(self, drives: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """
+        Verifica inmediatamente si hay unidades nuevas con una actualización
+        
+        Args:
+            drives: Unidades montadas a usar en lugar de consultar el sistema
+                    (permite inyectar montajes en pruebas)
+        
+        Returns:
+            Dict con info de la actualización encontrada, None si no hay
+        """
+        with self.lock:
+            current_drives = self._get_current_drives() if drives is None else set(drives)
+            # Detectar nuevas unidades
+            new_drives = current_drives - self.known_drives
+            # Actualizar conjunto de unidades conocidas
+            self.known_drives = current_drives
+        
+        if not new_drives:
+            return None
+        
+        print(f"USB Monitor: Nueva(s) unidad(es) detectada(s): {new_drives}")
+        
+        # Verificar cada nueva unidad
+        for drive in sorted(new_drives):
+            update_info = self._check_for_update_package(drive)
+            if update_info:
+                # Encontramos una actualización válida
+                print(f"USB Monitor: Activando callback de actualización...")
+                try:
+                    self.update_callback(update_info)
+                except Exception as e:
+                    print(f"USB Monitor: Error en callback: {e}")
+                # Solo procesamos la primera actualización encontrada
+                return update_info
+        return None
+    
     def _check_for_update_package(self, drive: str) -> Optional[dict]:
         """
         Verifica si una unidad contiene un paquete de actualización válido
@@ -72,6 +179,10 @@ class USBMonitor:
         Returns:
             Dict con info de actualización si es válida, None si no
         """
+        archive_path = os.path.join(drive, ARCHIVE_NAME)
+        if os.path.isfile(archive_path):
+            return self._check_update_archive(archive_path)
+        
         update_path = os.path.join(drive, 'pos_update')
         info_file = os.path.join(update_path, 'update_info.json')
         
@@ -88,12 +199,8 @@ class USBMonitor:
             with open(info_file, 'r', encoding='utf-8') as f:
                 update_info = json.load(f)
             
-            # Validar campos requeridos
-            required_fields = ['version', 'platform', 'files_checksum']
-            for field in required_fields:
-                if field not in update_info:
-                    print(f"USB Monitor: update_info.json inválido, falta campo '{field}'")
-                    return None
+            if not self._validate_update_info(update_info):
+                return None
             
             # Verificar que existe carpeta de archivos
             files_path = os.path.join(update_path, 'files')
@@ -123,42 +230,70 @@ class USBMonitor:
             print(f"USB Monitor: Error verificando paquete: {e}")
             return None
     
+    def _validate_update_info(self, update_info: dict) -> bool:
+        # Validar campos requeridos
+        required_fields = ['version', 'platform', 'files_checksum']
+        for field in required_fields:
+            if field not in update_info:
+                print(f"USB Monitor: update_info.json inválido, falta campo '{field}'")
+                return False
+        return True
+    
+    def _check_update_archive(self, archive_path: str) -> Optional[dict]:
+        """
+        Verifica un paquete pos_update.zip: firma y update_info.json
+        Solo se leen los metadatos (índice del zip), no el contenido completo
+        """
+        try:
+            with UpdateArchive(archive_path) as archive:
+                valid, message = archive.verify_signature()
+                if not valid:
+                    print(f"USB Monitor: {ARCHIVE_NAME} inválido: {message}")
+                    return None
+                update_info = archive.read_json(INFO_FILE)
+            
+            if not self._validate_update_info(update_info):
+                return None
+            
+            update_info['package_path'] = archive_path
+            
+            print(f"USB Monitor: Paquete de actualización válido encontrado en {archive_path}")
+            print(f"  Versión: {update_info.get('version')}")
+            print(f"  Descripción: {update_info.get('description', 'N/A')}")
+            
+            return update_info
+            
+        except Exception as e:
+            print(f"USB Monitor: Error verificando {ARCHIVE_NAME}: {e}")
+            return None
+    
     def _monitor_loop(self):
         """Loop principal del monitor (corre en thread separado)"""
+        interval = self.check_interval
         while self.running:
+            previous_drives = self.known_drives
             try:
-                # Obtener unidades actuales
-                current_drives = self._get_current_drives()
-                
-                # Detectar nuevas unidades
-                new_drives = current_drives - self.known_drives
-                
-                if new_drives:
-                    print(f"USB Monitor: Nueva(s) unidad(es) detectada(s): {new_drives}")
-                    
-                    # Verificar cada nueva unidad
-                    for drive in new_drives:
-                        update_info = self._check_for_update_package(drive)
-                        if update_info:
-                            # Encontramos una actualización válida
-                            print(f"USB Monitor: Activando callback de actualización...")
-                            try:
-                                self.update_callback(update_info)
-                            except Exception as e:
-                                print(f"USB Monitor: Error en callback: {e}")
-                            # Solo procesamos la primera actualización encontrada
-                            break
-                    
-                    # print(f"DEBUG: USB Check complete. Scanned {len(new_drives)} new drives.")
-                
-                # Actualizar conjunto de unidades conocidas
-                self.known_drives = current_drives
-                
+                self.check_now()
             except Exception as e:
                 print(f"USB Monitor: Error en loop de monitoreo: {e}")
             
-            # Esperar antes del siguiente chequeo
-            time.sleep(self.check_interval)
+            if self.watcher:
+                # Sin despertares: solo se revisa cuando cambia la tabla de montajes
+                try:
+                    self.watcher.wait()
+                    continue
+                except (OSError, ValueError) as e:
+                    if not self.running:
+                        break
+                    print(f"USB Monitor: Error esperando eventos ({e}), usando sondeo")
+                    self.watcher = None
+            
+            # Sondeo adaptativo: el intervalo se duplica mientras no haya cambios
+            if self.known_drives != previous_drives:
+                interval = self.check_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+            self.stop_event.wait(interval)
 
 
 # Ejemplo de uso
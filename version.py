@@ -10,3 +10,11 @@ def get_version():
     return VERSION
 
 
+
+def parse_version(v):
+    """Convierte 'X.Y.Z' en tupla de enteros (ValueError si es inválida)"""
+    return tuple(int(x) for x in v.split('.'))
+
+def is_newer_version(candidate, current):
+    """True si candidate es una versión posterior a current"""
+    return parse_version(candidate) > parse_version(current)